@@ -1,116 +1,128 @@
-from flask import Flask, jsonify, request, send_from_directory
-import sqlite3
-import pandas as pd
+from flask import Flask, Response, jsonify, request, send_from_directory
+from collections import OrderedDict
 import json
 import os
+import threading
+import time
+
+import metrics
+import mmapfile
+import named_queries
+import snapshot
+
+# Heavy modules (sqlite3, gazetteer/geostats -> numpy) are imported inside the
+# functions that build the snapshot or serve /api/stats, so a worker with a fresh
+# players.snapshot serves its first request without loading them.
+#
+# Everything a request reads (snapshot, named queries, gazetteer, NumPy arrays,
+# cached results) hangs off one Dataset object. A background thread polls the
+# source files and, when they change, builds and warms a new Dataset before
+# swapping it in with a single assignment: requests never wait for a reload and
+# never mix two data versions.
 
 HERE = os.path.dirname(__file__)
 DB_PATH = os.path.join(HERE, 'combined_table.db')
 COLLEGE_CSV = os.path.join(HERE, 'college_raw.csv')
 QUERIES_SQL = os.path.join(HERE, 'queries.sql')
+ALIASES_CSV = os.path.join(HERE, 'college_aliases.csv')
+SNAPSHOT_PATH = os.path.join(HERE, 'players.snapshot')
+# how often the watcher thread stats the source files to notice changed data
+SNAPSHOT_CHECK_INTERVAL = float(os.environ.get('SNAPSHOT_CHECK_INTERVAL', '1.0'))
+# start the watcher with the first request (serve.py turns it off in its workers;
+# its master process watches and re-forks instead)
+WATCH_DATA = os.environ.get('WATCH_DATA', '1') != '0'
+# /api/query/<name> results kept per (name, parameters) for each data version
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', '256'))
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 
+metrics.describe('app_query_rows', 'histogram', 'Rows returned by queries.sql per request.')
+metrics.describe('app_response_features', 'histogram', 'Features returned per /api/players request.')
+metrics.describe('app_geocode_total', 'counter', 'Distinct colleges geocoded per snapshot build, by method.')
+metrics.describe('app_cache_total', 'counter', 'In-process cache lookups, by cache and result (hit/miss).')
+metrics.describe('app_snapshot_builds_total', 'counter', 'players.snapshot rebuilds triggered by changed sources.')
+metrics.describe('app_snapshot_build_seconds', 'histogram', 'Time to rebuild players.snapshot in seconds.')
+metrics.describe('app_named_query_rows', 'histogram', 'Rows returned per /api/query/<name> execution.')
+metrics.describe('app_data_reloads_total', 'counter', 'Dataset reloads by the watcher thread, by result.')
+metrics.describe('app_data_reload_seconds', 'histogram', 'Time to build and warm a new Dataset in seconds.')
+
+# the last gazetteer handed out, to count reuse vs. reloads of college_raw.csv
+_colleges_cache = {'gaz': None}
+
+# the Dataset being served; only ever replaced as a whole
+_dataset = {'current': None, 'watcher': None}
+_dataset_lock = threading.Lock()
+
+# one read-only connection per thread (and per process, for forked workers); sqlite3
+# keeps each distinct statement prepared on its connection (cached_statements)
+_db_local = threading.local()
 
-def read_query():
-    with open(QUERIES_SQL, 'r', encoding='utf-8') as f:
-        raw = f.read()
-    # Use the first statement (before first semicolon) if multiple
-    stmt = raw.strip()
-    if ';' in stmt:
-        stmt = stmt.split(';', 1)[0]
-    return stmt
 
+def db_connection(stamp):
+    """This thread's read-only connection, reopened when the DB stamp (data version) changes."""
+    import sqlite3
+    conn = getattr(_db_local, 'conn', None)
+    if conn is None or _db_local.pid != os.getpid() or _db_local.stamp != stamp:
+        if conn is not None and _db_local.pid == os.getpid():
+            conn.close()
+        uri = 'file:' + os.path.abspath(DB_PATH) + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        _db_local.conn, _db_local.pid, _db_local.stamp = conn, os.getpid(), stamp
+    return conn
 
-def query_db(sql):
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    cur.execute(sql)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+
+def query_db(sql, db_stamp, params=()):
+    cur = db_connection(db_stamp).execute(sql, params)
+    return [dict(r) for r in cur.fetchall()]
 
 
 def load_colleges():
-    # load databayou colleges CSV (expected to contain lat/lon columns)
     if not os.path.exists(COLLEGE_CSV):
-        return pd.DataFrame()
-    try:
-        df = pd.read_csv(COLLEGE_CSV, encoding='utf-8')
-    except Exception:
-        df = pd.read_csv(COLLEGE_CSV, encoding='latin1')
-    # normalize column names
-    cols = {c.lower(): c for c in df.columns}
-    # find lat/lon heuristically
-    lat_col = None
-    lon_col = None
-    for k in cols:
-        if 'lat' in k:
-            lat_col = cols[k]
-        if 'lon' in k or 'lng' in k or 'long' in k:
-            lon_col = cols[k]
-    # ensure name column
-    name_col = cols.get('name') or cols.get('college') or list(df.columns)[0]
-    df = df.rename(columns={name_col: 'name'})
-    if lat_col:
-        df = df.rename(columns={lat_col: 'lat'})
-    if lon_col:
-        df = df.rename(columns={lon_col: 'lon'})
-    return df
-
-
-def match_college_coords(college_name, colleges_df):
-    if colleges_df is None or colleges_df.empty:
         return None
-    key = str(college_name).lower().strip()
-    # exact match
-    m = colleges_df[colleges_df['name'].str.lower().str.strip() == key]
-    if not m.empty and 'lat' in m.columns and 'lon' in m.columns:
-        row = m.iloc[0]
-        return (float(row['lon']), float(row['lat']))
-    # substring match
-    m = colleges_df[colleges_df['name'].str.lower().str.contains(key, na=False)]
-    if not m.empty and 'lat' in m.columns and 'lon' in m.columns:
-        row = m.iloc[0]
-        return (float(row['lon']), float(row['lat']))
-    # token overlap
-    tokens = [t for t in key.replace(',', ' ').split() if len(t) > 2]
-    if tokens:
-        def score_name(n):
-            ln = str(n).lower()
-            return sum(1 for t in tokens if t in ln)
-        scores = colleges_df['name'].apply(score_name)
-        best = scores.idxmax()
-        if scores.loc[best] > 0 and 'lat' in colleges_df.columns and 'lon' in colleges_df.columns:
-            row = colleges_df.loc[best]
-            try:
-                return (float(row['lon']), float(row['lat']))
-            except Exception:
-                return None
-    return None
+    import gazetteer
+    gaz = gazetteer.load(COLLEGE_CSV)
+    if gaz is _colleges_cache['gaz']:
+        metrics.inc('app_cache_total', cache='colleges', result='hit')
+    else:
+        metrics.inc('app_cache_total', cache='colleges', result='miss')
+        _colleges_cache['gaz'] = gaz
+    return gaz
 
 
-@app.route('/api/players')
-def api_players():
-    q = request.args.get('q', '').strip().lower()
-    sql = read_query()
-    rows = query_db(sql)
-    # in-memory filter by q if provided
-    if q:
-        def keep(r):
-            for k in ('name', 'college', 'position', 'team_status'):
-                if r.get(k) and q in str(r.get(k)).lower():
-                    return True
-            return False
-        rows = [r for r in rows if keep(r)]
-
-    colleges_df = load_colleges()
+def data_sources():
+    """Size/mtime of every file the snapshot is derived from."""
+    return {
+        'db': mmapfile.file_stamp(DB_PATH),
+        'colleges': mmapfile.file_stamp(COLLEGE_CSV),
+        'queries': mmapfile.file_stamp(QUERIES_SQL),
+        'aliases': mmapfile.file_stamp(ALIASES_CSV),
+    }
+
+
+def build_features(sources):
+    """Run queries.sql and geocode its colleges in one batch.
+
+    Returns (features, coverage report); rows whose college has no coordinates
+    are left out of the features and listed in the report.
+    """
+    import geocode
+    with metrics.span('read_query'):
+        sql = named_queries.load(QUERIES_SQL).map_query().sql
+    with metrics.span('query_db'):
+        rows = query_db(sql, sources['db'])
+    metrics.observe('app_query_rows', len(rows), buckets=metrics.COUNT_BUCKETS)
+    with metrics.span('load_colleges'):
+        colleges = load_colleges()
+    names = [r.get('college') for r in rows]
+    with metrics.span('geocode'):
+        resolved = geocode.resolve_all(names, colleges, geocode.load_aliases(ALIASES_CSV))
+    for res in resolved.values():
+        metrics.inc('app_geocode_total', method=res['method'])
     features = []
     for r in rows:
-        coords = match_college_coords(r.get('college'), colleges_df)
+        coords = geocode.coords_for(r.get('college'), resolved)
         if not coords:
-            # skip entries without coordinates
             continue
         lon, lat = coords
         feat = {
@@ -119,8 +131,350 @@ def api_players():
             'properties': r
         }
         features.append(feat)
-    fc = {'type': 'FeatureCollection', 'features': features}
-    return jsonify(fc)
+    return features, geocode.coverage_report(names, resolved)
+
+
+def build_snapshot(path=SNAPSHOT_PATH, sources=None):
+    # stamp the sources before reading them: a change mid-build triggers another rebuild
+    if sources is None:
+        sources = data_sources()
+    with metrics.timed('app_snapshot_build_seconds'):
+        features, coverage = build_features(sources)
+        snapshot.write(path, features, sources, coverage)
+    metrics.inc('app_snapshot_builds_total')
+    return path
+
+
+class Dataset:
+    """One consistent version of everything the API serves.
+
+    The snapshot and named queries are opened eagerly; the gazetteer, the
+    nearest-college grid, the NumPy views and per-state aggregates are built on
+    first use (or ahead of time by warm()). Nothing is ever mutated in place
+    once other requests can see it, except the memo dicts filled under _lock.
+    """
+
+    def __init__(self, sources):
+        self.sources = sources
+        self.queries = named_queries.load(QUERIES_SQL)
+        if not snapshot.is_fresh(SNAPSHOT_PATH, sources):
+            build_snapshot(SNAPSHOT_PATH, sources)
+        self.snap = snapshot.Snapshot(SNAPSHOT_PATH)
+        self.version = self.snap.version
+        # reentrant: building by_state builds arrays first
+        self._lock = threading.RLock()
+        self._lazy = {}
+        # (name, params) -> response body, least recently used first
+        self.query_results = OrderedDict()
+
+    def _get(self, key, build):
+        if key not in self._lazy:
+            with self._lock:
+                if key not in self._lazy:
+                    self._lazy[key] = build()
+        return self._lazy[key]
+
+    def colleges(self):
+        """The gazetteer, or None when college_raw.csv is missing."""
+        return self._get('colleges', load_colleges)
+
+    def college_grid(self):
+        import geostats
+        colleges = self.colleges()
+        return self._get('grid', lambda: geostats.GridIndex(colleges.lon, colleges.lat))
+
+    def arrays(self):
+        """lon/lat/category-code NumPy arrays over the snapshot (zero-copy views)."""
+        def build():
+            import numpy as np
+            snap = self.snap
+            arrays = {
+                'lon': np.frombuffer(snap.lon, dtype=np.float64),
+                'lat': np.frombuffer(snap.lat, dtype=np.float64),
+            }
+            for field in snapshot.CATEGORY_FIELDS:
+                arrays[field] = np.frombuffer(snap.codes(field), dtype=np.uint32)
+            return arrays
+        return self._get('arrays', build)
+
+    def in_bbox(self, bbox, ids=None):
+        """Ascending ids (of `ids`, or of all features) whose coordinates lie inside `bbox`."""
+        import geostats
+        import numpy as np
+        arrays = self.arrays()
+        mask = geostats.bbox_mask(arrays['lon'], arrays['lat'], bbox)
+        if ids is None:
+            return np.flatnonzero(mask).tolist()
+        ids = np.asarray(ids, dtype=np.int64)
+        return ids[mask[ids]].tolist()
+
+    def by_state(self):
+        """Player counts per state, broken down by position and team_status."""
+        def build():
+            import geostats
+            arrays = self.arrays()
+            cats = self.snap.categories
+            n_states = len(cats['state'])
+            by_pos = geostats.crosstab(arrays['state'], arrays['position'], n_states, len(cats['position']))
+            by_status = geostats.crosstab(arrays['state'], arrays['team_status'], n_states,
+                                          len(cats['team_status']))
+            totals = by_pos.sum(axis=1)
+            result = {}
+            for code in totals.nonzero()[0]:
+                result[cats['state'][code] or 'unknown'] = {
+                    'count': int(totals[code]),
+                    'position': geostats.nonzero_counts(by_pos[code], cats['position']),
+                    'team_status': geostats.nonzero_counts(by_status[code], cats['team_status']),
+                }
+            return {'total': self.snap.n, 'states': result}
+        return self._get('by_state', build)
+
+    def run_query(self, query, params):
+        """JSON body for a named `query` with `params`, cached for the life of this Dataset."""
+        key = (query.name, tuple(sorted(params.items())))
+        with self._lock:
+            body = self.query_results.get(key)
+            if body is not None:
+                self.query_results.move_to_end(key)
+        if body is not None:
+            metrics.inc('app_cache_total', cache='named_query', result='hit')
+            return body
+        metrics.inc('app_cache_total', cache='named_query', result='miss')
+        with metrics.span('query_db'):
+            cur = db_connection(self.sources['db']).execute(query.sql, params)
+            columns = [d[0] for d in cur.description]
+            rows = [dict(zip(columns, r)) for r in cur.fetchall()]
+        metrics.observe('app_named_query_rows', len(rows), buckets=metrics.COUNT_BUCKETS)
+        with metrics.span('serialize'):
+            body = json.dumps({'name': query.name, 'params': params, 'columns': columns, 'rows': rows},
+                              separators=(',', ':')).encode('utf-8') + b'\n'
+        with self._lock:
+            self.query_results[key] = body
+            while len(self.query_results) > QUERY_CACHE_SIZE:
+                self.query_results.popitem(last=False)
+        return body
+
+    def warm(self, previous):
+        """Build ahead of time whatever `previous` had built, so the swap causes no slow requests."""
+        import sqlite3
+        if previous is None:
+            return
+        for key, build in (('colleges', self.colleges), ('grid', self.college_grid),
+                           ('arrays', self.arrays), ('by_state', self.by_state)):
+            if key in previous._lazy:
+                build()
+        for name, params in list(previous.query_results):
+            query = self.queries.get(name)
+            if query is not None and set(query.params) == {k for k, _ in params}:
+                try:
+                    self.run_query(query, dict(params))
+                except sqlite3.Error:
+                    pass  # the request path reports it
+
+
+def load_dataset(if_missing=False):
+    """Build a Dataset from the current sources, warm it and make it the served one."""
+    with _dataset_lock:
+        previous = _dataset['current']
+        if if_missing and previous is not None:
+            return previous
+        with metrics.timed('app_data_reload_seconds'):
+            ds = Dataset(data_sources())
+            ds.warm(previous)
+        _dataset['current'] = ds
+    return ds
+
+
+def _watch_data():
+    # mtime polling: portable, and cheap for three files
+    failed = None  # sources of the last failed reload, retried only once they change again
+    while True:
+        time.sleep(SNAPSHOT_CHECK_INTERVAL)
+        current = _dataset['current']
+        sources = data_sources()
+        if (current is not None and sources == current.sources) or sources == failed:
+            continue
+        try:
+            load_dataset()
+            failed = None
+            metrics.inc('app_data_reloads_total', result='ok')
+        except Exception as e:  # keep serving the previous version
+            failed = sources
+            metrics.inc('app_data_reloads_total', result='error')
+            app.logger.error('data reload failed, still serving version %s: %s',
+                             current.version if current else None, e)
+
+
+def start_watcher():
+    with _dataset_lock:
+        if _dataset['watcher'] is None:
+            t = threading.Thread(target=_watch_data, name='data-watcher', daemon=True)
+            t.start()
+            _dataset['watcher'] = t
+
+
+def current_dataset():
+    """The Dataset to use for this request (loaded on first use; never blocks on reloads)."""
+    ds = _dataset['current']
+    if ds is None:
+        ds = load_dataset(if_missing=True)
+    if WATCH_DATA and _dataset['watcher'] is None:
+        start_watcher()
+    return ds
+
+
+@app.route('/api/players')
+def api_players():
+    q = request.args.get('q', '').strip().lower()
+    bbox = request.args.get('bbox', '').strip()
+    if bbox:
+        import geostats
+        try:
+            bbox = geostats.parse_bbox(bbox)
+        except ValueError as e:
+            return bad_request(str(e))
+    with metrics.span('load_snapshot'):
+        ds = current_dataset()
+        snap = ds.snap
+    ids = None
+    # in-memory filter by q if provided
+    if q:
+        with metrics.span('filter'):
+            ids = snap.match(q)
+    # and by the map viewport, `bbox=west,south,east,north`
+    if bbox:
+        with metrics.span('bbox'):
+            ids = ds.in_bbox(bbox, ids)
+    metrics.observe('app_response_features', snap.n if ids is None else len(ids), buckets=metrics.COUNT_BUCKETS)
+    with metrics.span('serialize'):
+        body = snap.body(ids)
+    return Response(body, mimetype='application/json')
+
+
+def bad_request(message):
+    return jsonify({'error': message}), 400
+
+
+def int_arg(name, default, lo, hi):
+    value = int(request.args.get(name, default))
+    if not lo <= value <= hi:
+        raise ValueError(f'{name} must be between {lo} and {hi}')
+    return value
+
+
+@app.route('/api/stats/distance')
+def api_stats_distance():
+    """Distribution of player-to-college distances from `from=lon,lat` (default Pittsburgh)."""
+    import geostats
+    try:
+        lon0, lat0 = geostats.parse_lonlat(request.args.get('from'))
+        bins = int_arg('bins', 10, 1, 100)
+    except ValueError as e:
+        return bad_request(str(e))
+    q = request.args.get('q', '').strip().lower()
+    ds = current_dataset()
+    arrays = ds.arrays()
+    lon, lat = arrays['lon'], arrays['lat']
+    if q:
+        with metrics.span('filter'):
+            ids = ds.snap.match(q)
+        lon, lat = lon[ids], lat[ids]
+    with metrics.span('haversine'):
+        dist = geostats.haversine_km(lon, lat, lon0, lat0)
+        summary = geostats.distance_summary(dist, bins=bins)
+    return jsonify({'from': [lon0, lat0], 'unit': 'km', **summary})
+
+
+@app.route('/api/stats/by_state')
+def api_stats_by_state():
+    """Player counts per state, broken down by position and team_status."""
+    with metrics.span('aggregate'):
+        result = current_dataset().by_state()
+    return jsonify(result)
+
+
+@app.route('/api/colleges/nearest')
+def api_colleges_nearest():
+    """The k colleges in college_raw.csv closest to `from=lon,lat` (default Pittsburgh)."""
+    import geostats
+    try:
+        lon0, lat0 = geostats.parse_lonlat(request.args.get('from'))
+        k = int_arg('k', 5, 1, 100)
+    except ValueError as e:
+        return bad_request(str(e))
+    ds = current_dataset()
+    colleges = ds.colleges()
+    if colleges is None:
+        return jsonify({'from': [lon0, lat0], 'colleges': []})
+    with metrics.span('grid_index'):
+        grid = ds.college_grid()
+    with metrics.span('nearest'):
+        hits = grid.nearest(lon0, lat0, k)
+    out = []
+    for row, dist in hits:
+        lon, lat = colleges.coords(row)
+        out.append({
+            'name': colleges.value('name', row),
+            'city': colleges.value('city', row),
+            'state': colleges.value('state', row),
+            'coordinates': [lon, lat],
+            'distance_km': round(dist, 3),
+        })
+    return jsonify({'from': [lon0, lat0], 'colleges': out})
+
+
+@app.route('/api/coverage')
+def api_coverage():
+    """Geocoding coverage of the served data: which colleges resolved, how, and which did not."""
+    return jsonify(current_dataset().snap.coverage or {})
+
+
+@app.route('/api/query')
+def api_query_list():
+    """The named statements in queries.sql and the parameters each one takes."""
+    queries = current_dataset().queries
+    return jsonify({'queries': [
+        {'name': q.name, 'params': q.params, 'description': q.description}
+        for q in queries.queries if q.name
+    ]})
+
+
+@app.route('/api/query/<name>')
+def api_query(name):
+    """Run the queries.sql statement `-- name: <name>`; its :params come from the query string."""
+    import sqlite3
+    ds = current_dataset()
+    query = ds.queries.get(name)
+    if query is None:
+        return jsonify({'error': f'no query named {name!r}'}), 404
+    missing = [p for p in query.params if p not in request.args]
+    if missing:
+        return bad_request(f'missing parameter(s): {", ".join(missing)}')
+    params = {p: request.args[p] for p in query.params}
+    try:
+        body = ds.run_query(query, params)
+    except sqlite3.Error as e:
+        return jsonify({'error': f'query {name!r} failed: {e}'}), 500
+    return Response(body, mimetype='application/json')
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@app.before_request
+def _start_timing():
+    metrics.start_request()
+
+
+@app.after_request
+def _finish_timing(response):
+    endpoint = request.endpoint or 'unmatched'
+    server_timing = metrics.finish_request(endpoint, response.status_code)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
 
 
 @app.route('/')
@@ -129,4 +483,15 @@ def index():
 
 
 if __name__ == '__main__':
-    app.run(host='127.0.0.1', port=5000, debug=False)
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve the players map and API.')
+    parser.add_argument('--build-snapshot', action='store_true',
+                        help='(re)build players.snapshot and exit, e.g. before starting workers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    if args.build_snapshot:
+        build_snapshot(SNAPSHOT_PATH)
+        print(f'Wrote {SNAPSHOT_PATH} ({snapshot.Snapshot(SNAPSHOT_PATH).n} features)')
+    else:
+        app.run(host=args.host, port=args.port, debug=False)
@@ -1,68 +1,233 @@
 #!/usr/bin/env python3
-"""Convert `combined_table.csv` into an SQLite database `combined_table.db`.
+"""Load `combined_table.csv` into the normalized SQLite database `combined_table.db`.
 
 This script:
-- reads `combined_table.csv` from the repo root
-- attempts to coerce numeric columns to numeric dtypes where appropriate
-- writes a single table named `combined_table` into `combined_table.db`
-- creates a simple index on `name` to speed lookups
+- reads `combined_table.csv` from the repo root (or `--csv`)
+- creates the schema in `schema.sql` (teams, seasons, sources, colleges, players,
+  roster_entries, the `combined_table` compatibility view and the
+  `players_resolved` per-player merge, which triggers keep up to date)
+- replaces only the (team, season) partitions present in the CSV, so loading one
+  team's roster does not touch the others; `--rebuild` starts from an empty DB
+- rows without `team`/`season` columns are loaded as the 2025 Pittsburgh Steelers
+- stores each college's address/city/state as geocoded by geocode.py (aliases,
+  then the gazetteer), not the scraper's own substring match, so the named
+  queries, the app snapshot and players.geojson all place a player alike
+- streams the CSV row by row (`read_rows`); `scrape_steelers_data.py --load-db`
+  feeds its rows to `load_rows` directly without the CSV round trip
 
-Run: python3 csv_to_sqlite.py
+Run: python3 csv_to_sqlite.py [--csv FILE] [--rebuild] [--profile [cprofile|sample]]
 """
+import argparse
+import codecs
+import csv
 from pathlib import Path
-import pandas as pd
 import sqlite3
 
+import gazetteer
+import geocode
+import profiling
+
 ROOT = Path(__file__).resolve().parent
 CSV = ROOT / 'combined_table.csv'
+COLLEGE_RAW = ROOT / 'college_raw.csv'
 DB = ROOT / 'combined_table.db'
+SCHEMA = ROOT / 'schema.sql'
+
+DEFAULT_TEAM = 'Pittsburgh Steelers'
+DEFAULT_SEASON = 2025
+
+
+def connect(db_path=DB):
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA foreign_keys = ON')
+    return conn
+
+
+def ensure_schema(conn, rebuild=False):
+    """Create the normalized schema, migrating away from the old flat table."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'combined_table'").fetchone()
+    if row and row[0] == 'table':
+        # pre-normalization DB: the flat table is rebuilt from CSV, drop it for the view
+        conn.execute('DROP TABLE combined_table')
+    if rebuild:
+        for view in ('combined_table', 'players_resolved_source'):
+            conn.execute(f'DROP VIEW IF EXISTS {view}')
+        for table in ('players_resolved', 'roster_entries', 'players', 'colleges', 'sources', 'seasons', 'teams'):
+            conn.execute(f'DROP TABLE IF EXISTS {table}')
+    conn.executescript(SCHEMA.read_text(encoding='utf-8'))
+    # DBs created before players_resolved existed have no materialized rows yet
+    resolved = conn.execute('SELECT count(*) FROM players_resolved').fetchone()[0]
+    expected = conn.execute('SELECT count(DISTINCT player_id) FROM roster_entries').fetchone()[0]
+    if resolved != expected:
+        refresh_players_resolved(conn)
+
+
+def refresh_players_resolved(conn):
+    """Rebuild players_resolved from scratch (the triggers handle incremental changes)."""
+    conn.execute('DELETE FROM players_resolved')
+    conn.execute('INSERT INTO players_resolved SELECT * FROM players_resolved_source')
+
 
+class _IdCache:
+    """Get-or-create ids for lookup-table rows, memoized for the duration of a load."""
 
-def coerce_numeric_columns(df, threshold=0.8):
-    """Attempt to convert columns to numeric if a high fraction of values convert.
+    def __init__(self, conn):
+        self.conn = conn
+        self.cache = {}
+
+    def get(self, table, id_col, key_cols, values, extra=None):
+        ck = (table,) + tuple(values)
+        if ck in self.cache:
+            return self.cache[ck]
+        where = ' AND '.join(f'{c} = ?' for c in key_cols)
+        row = self.conn.execute(f'SELECT {id_col} FROM {table} WHERE {where}', values).fetchone()
+        if row:
+            rid = row[0]
+        else:
+            cols = list(key_cols) + list((extra or {}).keys())
+            vals = list(values) + list((extra or {}).values())
+            marks = ', '.join('?' for _ in cols)
+            rid = self.conn.execute(f'INSERT INTO {table} ({", ".join(cols)}) VALUES ({marks})', vals).lastrowid
+        self.cache[ck] = rid
+        return rid
+
+
+class _Places:
+    """Geocoded (address, city, state) of each roster college name, resolved once per load."""
+
+    def __init__(self, colleges=None):
+        self.colleges = colleges
+        self.aliases = None
+        self.cache = {}
+
+    def get(self, college):
+        key = geocode.normalize(college)
+        if key not in self.cache:
+            if self.aliases is None:
+                if self.colleges is None and COLLEGE_RAW.exists():
+                    self.colleges = gazetteer.load(COLLEGE_RAW)
+                self.aliases = geocode.load_aliases()
+            res = geocode.resolve_one(key, self.colleges, self.aliases)
+            self.cache[key] = tuple(res.get(k, '') for k in ('address', 'city', 'state'))
+        return self.cache[key]
+
+
+def _detect_encoding(path, chunk_size=1 << 20):
+    # utf-8 unless some byte sequence is invalid, then latin1; checked in chunks
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(path, 'rb') as f:
+            while chunk := f.read(chunk_size):
+                decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'latin1'
+    return 'utf-8'
 
-    threshold: fraction of non-null values after coercion required to accept numeric conversion.
+
+def read_rows(csv_path):
+    """Yield each row of a CSV as a dict of strings, reading the file as a stream.
+
+    Rows with more fields than the header are skipped (as pandas
+    on_bad_lines='skip' did); short rows are padded with ''.
     """
-    for col in df.columns:
-        # Try to parse numeric values
-        try:
-            conv = pd.to_numeric(df[col], errors='coerce')
-        except Exception:
+    with open(csv_path, newline='', encoding=_detect_encoding(csv_path)) as f:
+        reader = csv.reader(f)
+        header = [c.strip() for c in next(reader, [])]
+        width = len(header)
+        for row in reader:
+            if len(row) > width:
+                continue
+            yield dict(zip(header, row + [''] * (width - len(row))))
+
+
+def _clean(v):
+    if v is None:
+        return ''
+    return str(v).strip()
+
+
+def load_rows(conn, rows, colleges=None):
+    """Insert combined_table-shaped dicts into the normalized tables.
+
+    Every (team, season) partition present in `rows` is cleared first, then all
+    rows are inserted in order. `rows` may be any iterable (it is consumed
+    once). A college's address/city/state come from geocode.resolve_one()
+    against `colleges` (the gazetteer; loaded from college_raw.csv if None),
+    empty when it does not resolve. Returns the number of roster entries written.
+    """
+    ids = _IdCache(conn)
+    places = _Places(colleges)
+    cleared = set()
+    n = 0
+    for r in rows:
+        name = _clean(r.get('name'))
+        if not name:
             continue
-        non_null_ratio = conv.notna().mean()
-        if non_null_ratio >= threshold:
-            df[col] = conv
-    return df
+        team = _clean(r.get('team')) or DEFAULT_TEAM
+        season = _clean(r.get('season')) or DEFAULT_SEASON
+        team_id = ids.get('teams', 'team_id', ['name'], [team])
+        season_id = ids.get('seasons', 'season_id', ['year'], [int(float(season))])
+        if (team_id, season_id) not in cleared:
+            conn.execute('DELETE FROM roster_entries WHERE team_id = ? AND season_id = ?', (team_id, season_id))
+            cleared.add((team_id, season_id))
 
+        player_id = ids.get('players', 'player_id', ['name_key'], [name.lower()], extra={'name': name})
+        college_id = None
+        college = _clean(r.get('college'))
+        if college:
+            college_src = _clean(r.get('college_source'))
+            college_src_id = ids.get('sources', 'source_id', ['url'], [college_src]) if college_src else None
+            college_id = ids.get('colleges', 'college_id', ['name', 'address', 'city', 'state'],
+                                 [college, *places.get(college)], extra={'source_id': college_src_id})
+        player_src = _clean(r.get('player_source'))
+        player_src_id = ids.get('sources', 'source_id', ['url'], [player_src]) if player_src else None
+        conn.execute(
+            'INSERT INTO roster_entries (team_id, season_id, player_id, college_id, position, team_status, source_id) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (team_id, season_id, player_id, college_id, _clean(r.get('position')), _clean(r.get('team_status')), player_src_id))
+        n += 1
+    return n
 
-def main():
-    if not CSV.exists():
-        print(f'Error: {CSV} not found')
-        return
 
-    # Read CSV using pandas (latin1 fallback not needed here but safe)
-    try:
-        df = pd.read_csv(CSV, encoding='utf-8', on_bad_lines='skip')
-    except Exception:
-        df = pd.read_csv(CSV, encoding='latin1', on_bad_lines='skip')
+def prune_orphans(conn):
+    """Drop players/colleges/sources no longer referenced after partitions were replaced."""
+    conn.execute('DELETE FROM players WHERE player_id NOT IN (SELECT player_id FROM roster_entries)')
+    conn.execute('DELETE FROM colleges WHERE college_id NOT IN '
+                 '(SELECT college_id FROM roster_entries WHERE college_id IS NOT NULL)')
+    conn.execute('DELETE FROM sources WHERE source_id NOT IN '
+                 '(SELECT source_id FROM roster_entries WHERE source_id IS NOT NULL '
+                 'UNION SELECT source_id FROM colleges WHERE source_id IS NOT NULL)')
 
-    # Coerce numeric-like columns (if any) to numeric types
-    df = coerce_numeric_columns(df, threshold=0.8)
 
-    # Connect to SQLite and write table
-    conn = sqlite3.connect(DB)
-    try:
-        df.to_sql('combined_table', conn, if_exists='replace', index=False)
-        # Create a small index on name for faster lookups
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=str(CSV), help='combined_table-shaped CSV to load')
+    parser.add_argument('--rebuild', action='store_true', help='drop all partitions before loading')
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    prof = profiling.from_args(args, 'csv_to_sqlite')
+
+    csv_path = Path(args.csv)
+    if not csv_path.exists():
+        print(f'Error: {csv_path} not found')
+        return
+
+    # Stream the CSV rows straight into the normalized tables
+    with prof.stage('write_sqlite'):
+        conn = connect(DB)
         try:
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_combined_name ON combined_table(name);')
-        except Exception:
-            pass
-        conn.commit()
-    finally:
-        conn.close()
-
-    print(f'Wrote SQLite DB: {DB} (table: combined_table, rows: {len(df)})')
+            ensure_schema(conn, rebuild=args.rebuild)
+            n = load_rows(conn, read_rows(csv_path))
+            prune_orphans(conn)
+            conn.commit()
+            conn.execute('ANALYZE')
+            conn.execute('VACUUM')
+        finally:
+            conn.close()
+
+    print(f'Wrote SQLite DB: {DB} (view: combined_table, roster entries loaded: {n})')
+    prof.report()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,295 @@
+"""Memory-mapped, columnar copy of the databayou college list (`college_raw.csv`).
+
+`college_raw.csv` has 17 mostly-empty columns and used to be parsed with pandas
+by every script (and, in `app.py`, per request). This module converts it once
+into `college_raw.gaz` next to the CSV and opens that file with `mmap`, so every
+process (and every forked worker) shares the same read-only pages:
+
+- a NumPy structured array with lat, lon, zip5 and zip4 per college
+- one string pool per text column (name, address, city, state, county):
+  an offsets array into a UTF-8 blob, each value followed by a newline
+- `name_key`, the lowercased/stripped names, stored the same way so exact and
+  substring lookups are a `mmap.find` over one blob instead of a Python loop
+
+Row order is the CSV order, so "first match" semantics are unchanged. The file
+is rebuilt automatically when the CSV's size or mtime changes.
+
+Usage:
+
+    gaz = gazetteer.load(ROOT / 'college_raw.csv')
+    i = gaz.find_substring('ohio state')
+    lon, lat = gaz.coords(i)
+
+Run `python3 gazetteer.py` to (re)build the file explicitly.
+"""
+import csv
+import io
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+import mmapfile
+
+MAGIC = b'GAZ1'
+VERSION = 1
+COORD_DTYPE = np.dtype([('lat', '<f8'), ('lon', '<f8'), ('zip5', '<u4'), ('zip4', '<u2'), ('_pad', '<u2')])
+TEXT_COLUMNS = {'name': 'Name', 'address': 'ADDR', 'city': 'CITY', 'state': 'State', 'county': 'County'}
+TOKEN_RE = re.compile(r'\w+')
+
+ROOT = Path(__file__).resolve().parent
+DEFAULT_CSV = ROOT / 'college_raw.csv'
+
+
+def gaz_path_for(csv_path):
+    return Path(csv_path).with_suffix('.gaz')
+
+
+def _read_csv_rows(csv_path):
+    raw = Path(csv_path).read_bytes()
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        text = raw.decode('latin1')
+    reader = csv.reader(io.StringIO(text, newline=''))
+    header = [c.strip() for c in next(reader)]
+    width = len(header)
+    for row in reader:
+        if len(row) > width:
+            # same as pandas on_bad_lines='skip'
+            continue
+        row = row + [''] * (width - len(row))
+        yield dict(zip(header, row))
+
+
+def _parse_float(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _parse_zip(v):
+    digits = re.findall(r'\d+', v or '')
+    zip5 = int(digits[0][:5]) if digits else 0
+    zip4 = int(digits[1][:4]) if len(digits) > 1 else 0
+    return zip5, zip4
+
+
+def _pool(values):
+    """Encode values as (offsets uint64[n+1], blob) with a newline after each value."""
+    offsets = np.zeros(len(values) + 1, dtype='<u8')
+    parts = []
+    pos = 0
+    for i, v in enumerate(values):
+        b = v.replace('\n', ' ').encode('utf-8') + b'\n'
+        parts.append(b)
+        offsets[i] = pos
+        pos += len(b)
+    offsets[len(values)] = pos
+    return offsets, b''.join(parts)
+
+
+def build(csv_path=DEFAULT_CSV, out_path=None):
+    """Convert the CSV into the columnar .gaz file (written atomically)."""
+    csv_path = Path(csv_path)
+    out_path = Path(out_path) if out_path else gaz_path_for(csv_path)
+    rows = list(_read_csv_rows(csv_path))
+    n = len(rows)
+    coords = np.zeros(n, dtype=COORD_DTYPE)
+    for i, r in enumerate(rows):
+        coords[i]['lat'] = _parse_float(r.get('lat'))
+        coords[i]['lon'] = _parse_float(r.get('long'))
+        coords[i]['zip5'], coords[i]['zip4'] = _parse_zip(r.get('ZIP'))
+
+    sections = [('coords', coords.tobytes())]
+    for col, src in TEXT_COLUMNS.items():
+        offsets, blob = _pool([r.get(src) or '' for r in rows])
+        sections.append((col + '.offsets', offsets.tobytes()))
+        sections.append((col + '.blob', blob))
+    offsets, blob = _pool([(r.get('Name') or '').lower().strip() for r in rows])
+    sections.append(('name_key.offsets', offsets.tobytes()))
+    sections.append(('name_key.blob', blob))
+
+    meta = {'rows': n, 'source': mmapfile.file_stamp(csv_path)}
+    return mmapfile.write(out_path, MAGIC, VERSION, meta, sections)
+
+
+class Gazetteer:
+    def __init__(self, gaz_path):
+        self.path = Path(gaz_path)
+        self._file = mmapfile.MappedFile(self.path, MAGIC, VERSION)
+        self._mm = self._file.mm
+        self.toc = self._file.toc
+        self.n = self.toc['rows']
+        sec = self.toc['sections']
+        # zero-copy views into the mapping
+        start, _ = sec['coords']
+        self.coord_array = np.frombuffer(self._mm, dtype=COORD_DTYPE, count=self.n, offset=start)
+        self._pools = {}
+        for col in list(TEXT_COLUMNS) + ['name_key']:
+            o_start, _ = sec[col + '.offsets']
+            b_start, b_len = sec[col + '.blob']
+            offsets = np.frombuffer(self._mm, dtype='<u8', count=self.n + 1, offset=o_start)
+            self._pools[col] = (offsets, b_start, b_len)
+        self._token_index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def source(self):
+        return self.toc['source']
+
+    @property
+    def lat(self):
+        return self.coord_array['lat']
+
+    @property
+    def lon(self):
+        return self.coord_array['lon']
+
+    def has_coords(self, i):
+        row = self.coord_array[i]
+        return not (np.isnan(row['lat']) or np.isnan(row['lon']))
+
+    def coords(self, i):
+        """(lon, lat) for row i, or None when the CSV had no coordinates."""
+        row = self.coord_array[i]
+        if np.isnan(row['lat']) or np.isnan(row['lon']):
+            return None
+        return float(row['lon']), float(row['lat'])
+
+    def value(self, col, i):
+        offsets, b_start, _ = self._pools[col]
+        a = b_start + int(offsets[i])
+        b = b_start + int(offsets[i + 1]) - 1  # drop the trailing newline
+        return self._mm[a:b].decode('utf-8')
+
+    def column(self, col):
+        """Decode a whole text column (allocates; prefer value()/find_* on hot paths)."""
+        offsets, b_start, b_len = self._pools[col]
+        return self._mm[b_start:b_start + b_len].decode('utf-8').split('\n')[:self.n]
+
+    def _row_at(self, col, pos):
+        offsets, b_start, _ = self._pools[col]
+        return int(np.searchsorted(offsets, pos - b_start, side='right')) - 1
+
+    def iter_substring(self, needle, col='name_key'):
+        """Yield rows (ascending, each once) whose `col` value contains `needle`."""
+        if not needle or '\n' in needle:
+            return
+        offsets, b_start, b_len = self._pools[col]
+        key = needle.encode('utf-8')
+        end = b_start + b_len
+        pos = self._mm.find(key, b_start, end)
+        while pos != -1:
+            row = self._row_at(col, pos)
+            yield row
+            # continue from the next row's start
+            pos = self._mm.find(key, b_start + int(offsets[row + 1]), end)
+
+    def find_substring(self, needle, require_coords=False, col='name_key'):
+        for row in self.iter_substring(needle, col):
+            if not require_coords or self.has_coords(row):
+                return row
+        return None
+
+    def find_exact(self, key, require_coords=False):
+        """First row whose lowercased/stripped name equals `key`."""
+        key = (key or '').lower().strip()
+        if not key:
+            return None
+        _, b_start, b_len = self._pools['name_key']
+        needle = ('\n' + key + '\n').encode('utf-8')
+        # row 0 has no leading newline; check it directly
+        if self.n and self.value('name_key', 0) == key and (not require_coords or self.has_coords(0)):
+            return 0
+        pos = self._mm.find(needle, b_start, b_start + b_len)
+        while pos != -1:
+            row = self._row_at('name_key', pos + 1)
+            if not require_coords or self.has_coords(row):
+                return row
+            pos = self._mm.find(needle, pos + 1, b_start + b_len)
+        return None
+
+    def token_index(self):
+        """Lazily built word -> ascending row ids over name_key (\\w+ tokens)."""
+        if self._token_index is None:
+            with self._lock:
+                if self._token_index is None:
+                    index = {}
+                    for i, name in enumerate(self.column('name_key')):
+                        for tok in set(TOKEN_RE.findall(name)):
+                            index.setdefault(tok, []).append(i)
+                    self._token_index = {k: np.asarray(v, dtype=np.int32) for k, v in index.items()}
+        return self._token_index
+
+    def best_token_overlap(self, tokens, require_coords=False):
+        """Row sharing the most whole-word tokens with `tokens` (first row wins ties)."""
+        index = self.token_index()
+        scores = Counter()
+        for tok in set(tokens):
+            for row in index.get(tok, ()):
+                scores[int(row)] += 1
+        best = None
+        best_score = 0
+        for row, score in scores.items():
+            if require_coords and not self.has_coords(row):
+                continue
+            if score > best_score or (score == best_score and best is not None and row < best):
+                best, best_score = row, score
+        return best
+
+    def best_substring_overlap(self, tokens, require_coords=False):
+        """Row whose name contains the most of `tokens` as substrings (first row wins ties)."""
+        scores = Counter()
+        for tok in set(tokens):
+            for row in self.iter_substring(tok):
+                scores[row] += 1
+        best = None
+        best_score = 0
+        for row, score in scores.items():
+            if require_coords and not self.has_coords(row):
+                continue
+            if score > best_score or (score == best_score and best is not None and row < best):
+                best, best_score = row, score
+        return best
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _is_fresh(gaz_path, csv_path):
+    meta = mmapfile.read_meta(gaz_path, MAGIC, VERSION)
+    return meta is not None and meta['source'] == mmapfile.file_stamp(csv_path)
+
+
+def load(csv_path=DEFAULT_CSV):
+    """Open (building or rebuilding if stale) the gazetteer for `csv_path`.
+
+    Instances are cached per process and replaced when the CSV changes.
+    """
+    csv_path = Path(csv_path)
+    gaz_path = gaz_path_for(csv_path)
+    st = csv_path.stat()
+    stamp = (st.st_size, st.st_mtime_ns)
+    with _cache_lock:
+        cached = _cache.get(csv_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        if not _is_fresh(gaz_path, csv_path):
+            build(csv_path, gaz_path)
+        gaz = Gazetteer(gaz_path)
+        _cache[csv_path] = (stamp, gaz)
+        return gaz
+
+
+if __name__ == '__main__':
+    out = build(DEFAULT_CSV)
+    g = Gazetteer(out)
+    print(f'Wrote {out} ({len(g)} colleges, {out.stat().st_size} bytes)')
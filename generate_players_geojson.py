@@ -2,71 +2,80 @@
 """Generate `players.geojson` from `combined_table.db` using the SQL in `queries.sql`.
 
 This script:
-- reads the SQL query from `queries.sql` (first statement)
-- executes it against `combined_table.db`
-- loads `college_raw.csv` to find lat/long for each player's college
+- reads the map's SQL query from `queries.sql` (the statement named `players`,
+  see named_queries.py)
+- executes it against `combined_table.db` (by default against `players_resolved`,
+  so each player appears once with merged positions; see schema.sql)
+- geocodes the distinct colleges in one batch through `college_aliases.csv` and
+  the memory-mapped copy of `college_raw.csv` (see geocode.py, gazetteer.py)
 - writes `players.geojson` with a Feature per player that has geometry = college lon/lat
+- writes `players_index.json`, the trigram search index the map's Web Worker
+  queries (see static/search_index.js); both files carry the same
+  `data_version` (a hash of the features) so the map rejects a stale index
+- writes `geocode_coverage.json`: players/colleges resolved, by method, and
+  every unmatched college with its player count
 
-Run: python3 generate_players_geojson.py
+Run: python3 generate_players_geojson.py [--profile [cprofile|sample]]
 """
+import argparse
+import hashlib
 import sqlite3
 import json
 from pathlib import Path
-import pandas as pd
-import re
+
+import gazetteer
+import geocode
+import named_queries
+import profiling
 
 ROOT = Path(__file__).resolve().parent
 DB = ROOT / 'combined_table.db'
 SQL_FILE = ROOT / 'queries.sql'
 COLLEGE_RAW = ROOT / 'college_raw.csv'
 OUT = ROOT / 'players.geojson'
+INDEX_OUT = ROOT / 'players_index.json'
+COVERAGE_OUT = geocode.REPORT_PATH
+
+SEARCH_FIELDS = ('name', 'college', 'position', 'team_status')
+SEARCH_SEP = '\u0001'
+GRAM_SIZE = 3
+
+
+def build_search_index(features):
+    """Build the trigram index for static/search_index.js.
+
+    docs[i] is feature i's searchable fields, lowercased and joined with SEARCH_SEP;
+    grams maps each trigram (never spanning two fields) to the ascending feature
+    ids containing it, delta-encoded to keep the JSON small.
+    """
+    docs = []
+    postings = {}
+    for i, feat in enumerate(features):
+        props = feat.get('properties') or {}
+        values = [str(props.get(k) or '').lower() for k in SEARCH_FIELDS]
+        docs.append(SEARCH_SEP.join(values))
+        for v in values:
+            for j in range(len(v) - GRAM_SIZE + 1):
+                ids = postings.setdefault(v[j:j + GRAM_SIZE], [])
+                if not ids or ids[-1] != i:
+                    ids.append(i)
+    grams = {}
+    for gram, ids in postings.items():
+        prev = 0
+        deltas = []
+        for i in ids:
+            deltas.append(i - prev)
+            prev = i
+        grams[gram] = deltas
+    return {'version': 1, 'fields': list(SEARCH_FIELDS), 'gram_size': GRAM_SIZE, 'docs': docs, 'grams': grams}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    prof = profiling.from_args(args, 'generate_players_geojson')
 
-
-def read_sql_query(path):
-    txt = path.read_text(encoding='utf-8')
-    # take first statement
-    parts = re.split(r";\s*\n", txt)
-    return parts[0]
-
-
-def load_college_coords(college_csv_path):
-    df = pd.read_csv(college_csv_path, dtype=str, encoding='latin1', on_bad_lines='skip')
-    # normalize name
-    df['Name_norm'] = df['Name'].str.lower().str.strip()
-    # ensure lat/long numeric
-    df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
-    df['long'] = pd.to_numeric(df['long'], errors='coerce')
-    # drop rows without coords
-    df = df[df['lat'].notna() & df['long'].notna()]
-    return df
-
-
-def find_coords_for_college(name, colleges_df):
-    if not name or pd.isna(name):
-        return None
-    key = name.lower().strip()
-    # exact substring match first
-    match = colleges_df[colleges_df['Name_norm'].str.contains(re.escape(key))]
-    if match.empty:
-        # try token overlap
-        tokens = set(re.findall(r"\w+", key))
-        best = None
-        best_score = 0
-        for _, row in colleges_df.iterrows():
-            tokens2 = set(re.findall(r"\w+", row['Name_norm']))
-            score = len(tokens & tokens2)
-            if score > best_score:
-                best_score = score
-                best = row
-        if best is not None and best_score > 0:
-            return float(best['long']), float(best['lat'])
-        return None
-    # use first match
-    r = match.iloc[0]
-    return float(r['long']), float(r['lat'])
-
-
-def main():
     if not DB.exists():
         print('combined_table.db not found; run csv_to_sqlite.py first')
         return
@@ -77,102 +86,75 @@ def main():
         print('college_raw.csv not found; required to map colleges to coordinates')
         return
 
-    sql = read_sql_query(SQL_FILE)
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    rows = cur.execute(sql).fetchall()
-    cols = [d[0] for d in cur.description]
-    conn.close()
-
-    colleges_df = load_college_coords(COLLEGE_RAW)
-    # Aggregate rows by player name to deduplicate and merge positions/statuses
-    players = {}
-
-    def status_rank(s):
-        if not s or s is None:
-            return 0
-        s2 = str(s).strip().lower()
-        # higher is better
-        if s2 == 'player':
-            return 3
-        if s2 == 'free agent':
-            return 2
-        if s2 == 'draft':
-            return 1
-        return 0
-
-    unique_colleges = set()
-    for row in rows:
-        rec = dict(zip(cols, row))
-        name = rec.get('name') or rec.get('Name') or rec.get('player')
-        if not name:
-            continue
-        unique_colleges.add((rec.get('college') or '').strip())
-        key = str(name).strip().lower()
-        college = rec.get('college')
-        coords = find_coords_for_college(college, colleges_df)
-        if not coords:
-            # record missing coords for debugging and skip
-            missing = rec.get('college') or '<no-college>'
-            print(f"Skipping '{name}': no coords found for college '{missing}'")
-            continue
-        lon, lat = coords
-        pos = (rec.get('position') or '').strip()
-        status = (rec.get('team_status') or '').strip()
-
-        entry = players.get(key)
-        if not entry:
-            players[key] = {
-                'name': name,
-                'positions': set([pos]) if pos else set(),
-                'team_status': status,
-                'status_rank': status_rank(status),
-                'college': college,
-                'college_address': rec.get('college_address'),
-                'city': rec.get('city'),
-                'state': rec.get('state'),
-                'coords': (lon, lat)
+    with prof.stage('query_db'):
+        sql = named_queries.load(SQL_FILE).map_query().sql
+        conn = sqlite3.connect(DB)
+        cur = conn.cursor()
+        rows = cur.execute(sql).fetchall()
+        cols = [d[0] for d in cur.description]
+        conn.close()
+
+    with prof.stage('load_colleges'):
+        colleges = gazetteer.load(COLLEGE_RAW)
+    # rows come from players_resolved, which already merges duplicate players
+    # (positions joined, best team_status/college by Player > Free Agent > Draft)
+    with prof.stage('resolve_colleges'):
+        records = []
+        for row in rows:
+            rec = dict(zip(cols, row))
+            name = rec.get('name') or rec.get('Name') or rec.get('player')
+            if not name:
+                continue
+            rec['name'] = name
+            records.append(rec)
+        names = [rec.get('college') for rec in records]
+        resolved = geocode.resolve_all(names, colleges)
+        entries = []
+        for rec in records:
+            coords = geocode.coords_for(rec.get('college'), resolved)
+            if coords:
+                rec['coords'] = coords
+                entries.append(rec)
+        report = geocode.coverage_report(names, resolved)
+
+    with prof.stage('write_geojson'):
+        features = []
+        for entry in entries:
+            lon, lat = entry['coords']
+            props = {
+                'name': entry['name'],
+                'position': entry.get('position') or '',
+                'college': entry.get('college'),
+                'college_address': entry.get('college_address'),
+                'city': entry.get('city'),
+                'state': entry.get('state'),
+                'team_status': entry.get('team_status')
+            }
+            feat = {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': props
             }
-        else:
-            # merge position
-            if pos:
-                entry['positions'].add(pos)
-            # choose better status if present
-            r = status_rank(status)
-            if r > entry.get('status_rank', 0):
-                # prefer record with higher status (Player > Free Agent > Draft)
-                entry['team_status'] = status
-                entry['status_rank'] = r
-                entry['college'] = college
-                entry['college_address'] = rec.get('college_address')
-                entry['city'] = rec.get('city')
-                entry['state'] = rec.get('state')
-                entry['coords'] = (lon, lat)
-
-    features = []
-    for entry in players.values():
-        lon, lat = entry['coords']
-        props = {
-            'name': entry['name'],
-            'position': '/'.join(sorted([p for p in entry['positions'] if p])),
-            'college': entry.get('college'),
-            'college_address': entry.get('college_address'),
-            'city': entry.get('city'),
-            'state': entry.get('state'),
-            'team_status': entry.get('team_status')
-        }
-        feat = {
-            'type': 'Feature',
-            'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
-            'properties': props
-        }
-        features.append(feat)
-
-    geo = {'type': 'FeatureCollection', 'features': features}
-    OUT.write_text(json.dumps(geo), encoding='utf-8')
-    print(f'Wrote {OUT} with {len(features)} features')
-    # report colleges available vs. missing
-    print(f'Tried to map {len(unique_colleges)} unique college names from query')
+            features.append(feat)
+
+        # shared with players_index.json so the map can tell a stale index from a current one
+        data_version = hashlib.sha1(json.dumps(features, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        geo = {'type': 'FeatureCollection', 'data_version': data_version, 'features': features}
+        OUT.write_text(json.dumps(geo), encoding='utf-8')
+        print(f'Wrote {OUT} with {len(features)} features')
+
+    with prof.stage('write_search_index'):
+        index = build_search_index(features)
+        index['data_version'] = data_version
+        INDEX_OUT.write_text(json.dumps(index, separators=(',', ':')), encoding='utf-8')
+        print(f'Wrote {INDEX_OUT} ({len(index["grams"])} trigrams)')
+    with prof.stage('write_coverage'):
+        COVERAGE_OUT.write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+    print(geocode.summary_line(report))
+    for miss in report['unmatched'][:10]:
+        print(f"  unmatched: {miss['college'] or '<no college>'!r} ({miss['players']} players)")
+    print(f'Wrote {COVERAGE_OUT}')
+    prof.report()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,171 @@
+"""Batch geocoding of player colleges, with an alias/override table and a coverage report.
+
+Rosters name colleges the way sports pages do ("Ohio State", "N.C. State"),
+which substring matching against the databayou list gets wrong or misses.
+`resolve_all()` takes every college name of a query result, deduplicates them
+and resolves each distinct name once:
+
+1. `college_aliases.csv`: `alias -> college` maps a roster name to the exact
+   gazetteer name (e.g. Ohio State -> Ohio State University-Main Campus); a row
+   that also has lat/lon is an override used as-is (e.g. Stanford, patched by
+   hand from raw_stanford.html)
+2. the gazetteer: exact name, then substring, then the name with the most of
+   the query's words (see gazetteer.py)
+
+Each resolution also carries the matched college's address, city and state;
+csv_to_sqlite.py stores those in the `colleges` table at load time, so a
+player's label (and the state the named queries count them in) always agrees
+with the plotted point.
+
+`coverage_report()` summarizes the result (players and colleges resolved, by
+method, plus every unmatched name with its player count) for
+`geocode_coverage.json` and the snapshot's `/api/coverage`.
+"""
+import csv
+import threading
+from collections import Counter
+from pathlib import Path
+
+import mmapfile
+
+ROOT = Path(__file__).resolve().parent
+ALIASES_CSV = ROOT / 'college_aliases.csv'
+REPORT_PATH = ROOT / 'geocode_coverage.json'
+REPORT_VERSION = 1
+
+
+def normalize(name):
+    return ' '.join(str(name or '').lower().split())
+
+
+_aliases = {}
+_aliases_lock = threading.Lock()
+
+
+def load_aliases(path=ALIASES_CSV):
+    """{normalized alias: row} from the alias/override CSV (empty if missing), cached per file stamp."""
+    path = Path(path)
+    stamp = mmapfile.file_stamp(path)
+    with _aliases_lock:
+        cached = _aliases.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    table = {}
+    if stamp is not None:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                key = normalize(row.get('alias'))
+                if key:
+                    table[key] = {k: (v or '').strip() for k, v in row.items() if k}
+    with _aliases_lock:
+        _aliases[path] = (stamp, table)
+    return table
+
+
+def match_gazetteer(key, colleges):
+    """(row, method) for a normalized college name, or (None, 'unmatched')."""
+    if colleges is None or not len(colleges) or not key:
+        return None, 'unmatched'
+    row = colleges.find_exact(key, require_coords=True)
+    if row is not None:
+        return row, 'exact'
+    row = colleges.find_substring(key, require_coords=True)
+    if row is not None:
+        return row, 'substring'
+    tokens = [t for t in key.replace(',', ' ').split() if len(t) > 2]
+    if tokens:
+        row = colleges.best_substring_overlap(tokens, require_coords=True)
+        if row is not None:
+            return row, 'token'
+    return None, 'unmatched'
+
+
+def _gazetteer_place(colleges, row):
+    return {'address': colleges.value('address', row), 'city': colleges.value('city', row),
+            'state': colleges.value('state', row)}
+
+
+def _override_coords(alias):
+    try:
+        return float(alias['lon']), float(alias['lat'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def resolve_one(key, colleges, aliases):
+    alias = aliases.get(key)
+    if alias:
+        coords = _override_coords(alias)
+        if coords:
+            return {'method': 'override', 'matched': alias.get('college') or key, 'coordinates': list(coords),
+                    **{k: alias.get(k, '') for k in ('address', 'city', 'state')}}
+        target = normalize(alias.get('college'))
+        row, method = match_gazetteer(target, colleges)
+        if row is not None:
+            return {'method': 'alias' if method == 'exact' else f'alias_{method}',
+                    'matched': colleges.value('name', row), 'coordinates': list(colleges.coords(row)),
+                    **_gazetteer_place(colleges, row)}
+        return {'method': 'unmatched', 'matched': None, 'coordinates': None,
+                'note': f'alias target {alias.get("college")!r} not in college_raw.csv'}
+    row, method = match_gazetteer(key, colleges)
+    if row is None:
+        return {'method': 'unmatched', 'matched': None, 'coordinates': None}
+    return {'method': method, 'matched': colleges.value('name', row), 'coordinates': list(colleges.coords(row)),
+            **_gazetteer_place(colleges, row)}
+
+
+def resolve_all(names, colleges, aliases=None):
+    """{normalized name: resolution} for the distinct names in `names` (each resolved once)."""
+    if aliases is None:
+        aliases = load_aliases()
+    return {key: resolve_one(key, colleges, aliases) for key in dict.fromkeys(normalize(n) for n in names)}
+
+
+def coords_for(name, resolved):
+    """(lon, lat) for a college name after resolve_all(), or None."""
+    c = resolved.get(normalize(name), {}).get('coordinates')
+    return tuple(c) if c else None
+
+
+def coverage_report(names, resolved):
+    """Coverage of a query result: `names` is the college of every row, in row order."""
+    players = Counter(normalize(n) for n in names)
+    display = {}
+    for n in names:
+        display.setdefault(normalize(n), str(n or '').strip())
+    methods = Counter()
+    rows_resolved = 0
+    colleges = []
+    unmatched = []
+    for key, res in resolved.items():
+        entry = {'college': display.get(key, key), 'players': players[key], **res}
+        methods[res['method']] += 1
+        if res['coordinates']:
+            rows_resolved += players[key]
+            colleges.append(entry)
+        else:
+            unmatched.append(entry)
+    unmatched.sort(key=lambda e: (-e['players'], e['college']))
+    colleges.sort(key=lambda e: e['college'])
+    n_rows = sum(players.values())
+    return {
+        'version': REPORT_VERSION,
+        'rows': n_rows,
+        'rows_resolved': rows_resolved,
+        'colleges': len(resolved),
+        'colleges_resolved': len(colleges),
+        'coverage': {
+            'rows': round(rows_resolved / n_rows, 4) if n_rows else 1.0,
+            'colleges': round(len(colleges) / len(resolved), 4) if resolved else 1.0,
+        },
+        'methods': dict(sorted(methods.items())),
+        'unmatched': unmatched,
+        'resolved': colleges,
+    }
+
+
+def summary_line(report):
+    return (f"Resolved {report['colleges_resolved']}/{report['colleges']} colleges "
+            f"({report['rows_resolved']}/{report['rows']} players); "
+            f"{len(report['unmatched'])} unmatched; methods: "
+            + ', '.join(f'{k}={v}' for k, v in report['methods'].items()))
@@ -0,0 +1,192 @@
+"""Vectorized geo analytics over the geocoded players and the college gazetteer.
+
+- `haversine_km(lon, lat, lon0, lat0)`: great-circle distances from one point
+  to arrays of points in a single NumPy expression (no Python loop per row)
+- `parse_bbox` / `bbox_mask`: a `west,south,east,north` viewport as a boolean
+  mask over coordinate arrays (boxes crossing the antimeridian have west > east)
+- `distance_summary(dist)`: count/min/max/mean, percentiles and a histogram
+- `crosstab(rows, cols, n_rows, n_cols)`: a contingency table of two integer
+  code arrays (as stored in `players.snapshot`) from one `np.bincount`
+- `GridIndex`: a fixed 1-degree lat/lon grid over the gazetteer coordinates
+  for k-nearest lookups. Points are sorted by cell so each cell is a slice;
+  a query grows rings of cells around the origin until it has k candidates,
+  then checks every cell inside the bounding box of the k-th distance, so the
+  answer is exact without scanning every college.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+# Pittsburgh, the default origin for distance stats
+PITTSBURGH = (-79.9959, 40.4406)
+PERCENTILES = (10, 25, 50, 75, 90, 95)
+
+
+def haversine_km(lon, lat, lon0, lat0):
+    """Distances in km from (lon0, lat0) to each point of the `lon`/`lat` arrays."""
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon0 = math.radians(lon0)
+    lat0 = math.radians(lat0)
+    a = (np.sin((lat - lat0) * 0.5) ** 2
+         + math.cos(lat0) * np.cos(lat) * np.sin((lon - lon0) * 0.5) ** 2)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def parse_lonlat(value, default=PITTSBURGH):
+    """'lon,lat' -> (lon, lat) floats; raises ValueError when malformed or out of range."""
+    if not value:
+        return default
+    parts = value.split(',')
+    if len(parts) != 2:
+        raise ValueError('expected "lon,lat"')
+    lon, lat = float(parts[0]), float(parts[1])
+    if not (-180.0 <= lon <= 180.0 and -90.0 <= lat <= 90.0) or math.isnan(lon) or math.isnan(lat):
+        raise ValueError('lon must be in [-180, 180] and lat in [-90, 90]')
+    return lon, lat
+
+
+def parse_bbox(value):
+    """'west,south,east,north' -> a tuple of floats; raises ValueError when malformed or out of range."""
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError('expected "west,south,east,north"')
+    west, south, east, north = (float(p) for p in parts)
+    if any(math.isnan(v) for v in (west, south, east, north)):
+        raise ValueError('bbox values must be numbers')
+    if not (-180.0 <= west <= 180.0 and -180.0 <= east <= 180.0 and -90.0 <= south <= north <= 90.0):
+        raise ValueError('bbox longitudes must be in [-180, 180] and -90 <= south <= north <= 90')
+    return west, south, east, north
+
+
+def bbox_mask(lon, lat, bbox):
+    """Boolean array: which (lon, lat) points lie inside `bbox` (points without coordinates never do)."""
+    west, south, east, north = bbox
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    if west <= east:
+        in_lon = (lon >= west) & (lon <= east)
+    else:
+        in_lon = (lon >= west) | (lon <= east)
+    # NaN compares False, so features without coordinates drop out here
+    return in_lon & (lat >= south) & (lat <= north)
+
+
+def distance_summary(dist, bins=10):
+    """Summary statistics and an equal-width histogram of a distance array (km)."""
+    dist = np.asarray(dist, dtype=np.float64)
+    dist = dist[~np.isnan(dist)]
+    if not dist.size:
+        return {'count': 0}
+    pct = np.percentile(dist, PERCENTILES)
+    counts, edges = np.histogram(dist, bins=bins)
+    return {
+        'count': int(dist.size),
+        'min_km': round(float(dist.min()), 3),
+        'max_km': round(float(dist.max()), 3),
+        'mean_km': round(float(dist.mean()), 3),
+        'percentiles_km': {f'p{p}': round(float(v), 3) for p, v in zip(PERCENTILES, pct)},
+        'histogram': {
+            'edges_km': [round(float(e), 3) for e in edges],
+            'counts': [int(c) for c in counts],
+        },
+    }
+
+
+def crosstab(rows, cols, n_rows, n_cols):
+    """n_rows x n_cols counts of (rows[i], cols[i]) code pairs."""
+    flat = np.asarray(rows, dtype=np.int64) * n_cols + np.asarray(cols, dtype=np.int64)
+    return np.bincount(flat, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+
+
+def nonzero_counts(counts, categories):
+    """{category: count} for the non-zero entries of a 1-d count array."""
+    return {categories[i]: int(counts[i]) for i in np.flatnonzero(counts)}
+
+
+class GridIndex:
+    """k-nearest-neighbour index over (lon, lat) points on a fixed degree grid."""
+
+    def __init__(self, lon, lat, cell_deg=1.0):
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        self.cell = float(cell_deg)
+        self.n_lat = int(math.ceil(180.0 / self.cell))
+        self.n_lon = int(math.ceil(360.0 / self.cell))
+        valid = ~(np.isnan(lon) | np.isnan(lat))
+        ids = np.flatnonzero(valid)
+        cells = self._cell_of(lon[ids], lat[ids])
+        order = np.argsort(cells, kind='stable')
+        # row ids (into the original arrays) grouped by cell; cell c is ids[starts[c]:starts[c + 1]]
+        self.ids = ids[order]
+        self.lon = lon[self.ids]
+        self.lat = lat[self.ids]
+        self.starts = np.searchsorted(cells[order], np.arange(self.n_lat * self.n_lon + 1))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _lat_idx(self, lat):
+        return np.clip(((np.asarray(lat) + 90.0) // self.cell).astype(np.int64), 0, self.n_lat - 1)
+
+    def _lon_idx(self, lon):
+        return ((np.asarray(lon) + 180.0) // self.cell).astype(np.int64) % self.n_lon
+
+    def _cell_of(self, lon, lat):
+        return self._lat_idx(lat) * self.n_lon + self._lon_idx(lon)
+
+    def _gather(self, lat_lo, lat_hi, lon_lo, lon_hi):
+        """Positions (into self.ids) of points in cell rows lat_lo..lat_hi, columns lon_lo..lon_hi (wrapping)."""
+        lat_lo = max(lat_lo, 0)
+        lat_hi = min(lat_hi, self.n_lat - 1)
+        if lon_hi - lon_lo + 1 >= self.n_lon:
+            spans = [(0, self.n_lon - 1)]
+        else:
+            a, b = lon_lo % self.n_lon, lon_hi % self.n_lon
+            spans = [(a, b)] if a <= b else [(a, self.n_lon - 1), (0, b)]
+        parts = []
+        for row in range(lat_lo, lat_hi + 1):
+            base = row * self.n_lon
+            for a, b in spans:
+                s, e = self.starts[base + a], self.starts[base + b + 1]
+                if e > s:
+                    parts.append(np.arange(s, e))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _bbox_cells(self, lon0, lat0, radius_km):
+        # bounding box of a spherical cap; covers all longitudes when it reaches a pole
+        d = radius_km / EARTH_RADIUS_KM
+        lat_min = lat0 - math.degrees(d)
+        lat_max = lat0 + math.degrees(d)
+        lat_lo = int(self._lat_idx(max(lat_min, -90.0)))
+        lat_hi = int(self._lat_idx(min(lat_max, 90.0)))
+        if lat_min <= -90.0 or lat_max >= 90.0 or d >= math.pi / 2:
+            return lat_lo, lat_hi, 0, self.n_lon - 1
+        dlon = math.degrees(math.asin(min(1.0, math.sin(d) / math.cos(math.radians(lat0)))))
+        c0 = int(self._lon_idx(lon0))
+        span = int(math.ceil(dlon / self.cell)) + 1
+        return lat_lo, lat_hi, c0 - span, c0 + span
+
+    def nearest(self, lon0, lat0, k=5):
+        """[(row id, distance km), ...] of the k points closest to (lon0, lat0), nearest first."""
+        k = min(int(k), len(self.ids))
+        if k <= 0:
+            return []
+        r0 = int(self._lat_idx(lat0))
+        c0 = int(self._lon_idx(lon0))
+        ring = 0
+        while True:
+            pos = self._gather(r0 - ring, r0 + ring, c0 - ring, c0 + ring)
+            covers_all = r0 - ring <= 0 and r0 + ring >= self.n_lat - 1 and 2 * ring + 1 >= self.n_lon
+            if len(pos) >= k or covers_all:
+                break
+            ring += 1
+        dist = haversine_km(self.lon[pos], self.lat[pos], lon0, lat0)
+        kth = float(np.partition(dist, k - 1)[k - 1])
+        # anything closer than the k-th candidate lies inside this cap's bounding box
+        pos = self._gather(*self._bbox_cells(lon0, lat0, kth))
+        dist = haversine_km(self.lon[pos], self.lat[pos], lon0, lat0)
+        top = np.argpartition(dist, k - 1)[:k] if len(pos) > k else np.arange(len(pos))
+        top = top[np.lexsort((self.ids[pos[top]], dist[top]))]
+        return [(int(self.ids[pos[i]]), float(dist[i])) for i in top]
@@ -0,0 +1,201 @@
+"""Lightweight request timing and Prometheus-style counters for `app.py`.
+
+This module:
+- times named phases of a request with `span('name')` (a context manager)
+- samples requests (METRICS_SAMPLE_RATE env var, 0.0-1.0, default 1.0) so the
+  per-phase bookkeeping can be turned down on busy servers
+- formats the sampled phases as a `Server-Timing` response header
+- keeps counters and latency histograms in-process and renders them in the
+  Prometheus text exposition format for the `/metrics` endpoint
+
+Everything is stdlib-only and guarded by a single lock; an unsampled span is a
+shared no-op object, so the cost of leaving this on is a few dict updates per
+request.
+"""
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# seconds; roughly log-spaced from 0.1 ms to 10 s
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# row / feature counts per request
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+                 25000, 50000, 100000)
+
+
+def _env_rate(name, default):
+    try:
+        rate = float(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return min(max(rate, 0.0), 1.0)
+
+
+SAMPLE_RATE = _env_rate('METRICS_SAMPLE_RATE', 1.0)
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> float
+_histograms = {}  # (name, labels) -> [bucket_counts, sum, count]
+_bucket_defs = {}  # name -> buckets
+_help = {}        # name -> (type, help text)
+_local = threading.local()
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def describe(name, kind, text):
+    """Register the TYPE/HELP lines for a metric family."""
+    _help[name] = (kind, text)
+
+
+def inc(name, value=1, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            _bucket_defs.setdefault(name, buckets)
+            h = _histograms[key] = [[0] * len(_bucket_defs[name]), 0.0, 0]
+        bounds = _bucket_defs[name]
+        for i, b in enumerate(bounds):
+            if value <= b:
+                h[0][i] += 1
+                break
+        h[1] += value
+        h[2] += 1
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        dur = time.perf_counter() - self.start
+        spans = getattr(_local, 'spans', None)
+        if spans is not None:
+            spans.append((self.name, dur))
+        observe('app_phase_seconds', dur, phase=self.name)
+        return False
+
+
+def span(name):
+    """Time a phase of the current request if the request is sampled."""
+    if getattr(_local, 'spans', None) is None:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def start_request(sample_rate=None):
+    """Begin tracking a request on this thread; returns True if sampled."""
+    rate = SAMPLE_RATE if sample_rate is None else sample_rate
+    sampled = rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+    _local.spans = [] if sampled else None
+    _local.start = time.perf_counter()
+    return sampled
+
+
+def finish_request(endpoint, status):
+    """Record the request latency; returns the Server-Timing header value or None."""
+    start = getattr(_local, 'start', None)
+    if start is None:
+        return None
+    total = time.perf_counter() - start
+    observe('app_request_seconds', total, endpoint=endpoint)
+    inc('app_requests_total', endpoint=endpoint, status=str(status))
+    spans = getattr(_local, 'spans', None)
+    _local.spans = None
+    _local.start = None
+    if spans is None:
+        return None
+    parts = [f'{name};dur={dur * 1000:.3f}' for name, dur in spans]
+    parts.append(f'total;dur={total * 1000:.3f}')
+    return ', '.join(parts)
+
+
+@contextmanager
+def timed(name, **labels):
+    """Time a block outside of the request cycle (no Server-Timing entry)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _fmt_labels(labels, extra=None):
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                    for k, v in items)
+    return '{' + body + '}'
+
+
+def _fmt_num(v):
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return repr(v) if isinstance(v, float) else str(v)
+
+
+def render_prometheus():
+    """Render all counters and histograms in Prometheus text format 0.0.4."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, (list(v[0]), v[1], v[2])) for k, v in _histograms.items())
+        bucket_defs = dict(_bucket_defs)
+    lines = []
+    seen = set()
+
+    def header(name, default_kind):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, text = _help.get(name, (default_kind, name))
+        lines.append(f'# HELP {name} {text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in counters:
+        header(name, 'counter')
+        lines.append(f'{name}{_fmt_labels(labels)} {_fmt_num(value)}')
+    for (name, labels), (counts, total, n) in histograms:
+        header(name, 'histogram')
+        cumulative = 0
+        for bound, c in zip(bucket_defs[name], counts):
+            cumulative += c
+            lines.append(f'{name}_bucket{_fmt_labels(labels, [("le", _fmt_num(float(bound)))])} {cumulative}')
+        lines.append(f'{name}_bucket{_fmt_labels(labels, [("le", "+Inf")])} {n}')
+        lines.append(f'{name}_sum{_fmt_labels(labels)} {total!r}')
+        lines.append(f'{name}_count{_fmt_labels(labels)} {n}')
+    return '\n'.join(lines) + '\n'
+
+
+describe('app_requests_total', 'counter', 'HTTP requests handled, by endpoint and status.')
+describe('app_request_seconds', 'histogram', 'End-to-end request latency in seconds.')
+describe('app_phase_seconds', 'histogram', 'Latency of sampled request phases in seconds.')
@@ -0,0 +1,90 @@
+"""Tiny container format for read-only, memory-mapped data files.
+
+Layout: a fixed header (4-byte magic, uint32 version, uint64 toc length), a JSON
+table of contents, then 8-byte aligned binary sections. The toc holds the
+caller's metadata plus `sections: {name: [offset, length]}`.
+
+Used by `gazetteer.py` (college_raw.gaz) and `snapshot.py` (players.snapshot).
+Only stdlib imports, so opening a file stays cheap on the serving path.
+"""
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+
+HEADER = struct.Struct('<4sIQ')  # magic, version, toc length
+
+
+def write(path, magic, version, meta, sections):
+    """Atomically write `sections` ([(name, bytes-like), ...]) with `meta` into `path`."""
+    path = Path(path)
+    toc = dict(meta)
+    toc['sections'] = {}
+    # section offsets depend on the toc length and vice versa; iterate until stable
+    toc_bytes = b''
+    while True:
+        pos = HEADER.size + len(toc_bytes)
+        for name, data in sections:
+            pos = (pos + 7) & ~7
+            toc['sections'][name] = [pos, len(data)]
+            pos += len(data)
+        new_toc = json.dumps(toc, sort_keys=True).encode('utf-8')
+        if len(new_toc) == len(toc_bytes):
+            toc_bytes = new_toc
+            break
+        toc_bytes = new_toc
+
+    tmp = path.with_name(path.name + f'.tmp{os.getpid()}')
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(magic, version, len(toc_bytes)))
+        f.write(toc_bytes)
+        for name, data in sections:
+            start = toc['sections'][name][0]
+            f.write(b'\0' * (start - f.tell()))
+            f.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def read_meta(path, magic, version):
+    """Return the toc of `path` without mapping it, or None if missing/incompatible."""
+    try:
+        with open(path, 'rb') as f:
+            got_magic, got_version, toc_len = HEADER.unpack(f.read(HEADER.size))
+            if got_magic != magic or got_version != version:
+                return None
+            return json.loads(f.read(toc_len))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def file_stamp(path):
+    """{'size', 'mtime_ns'} of `path` (None if missing), used to detect changed sources."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+class MappedFile:
+    def __init__(self, path, magic, version):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        got_magic, got_version, toc_len = HEADER.unpack_from(self.mm, 0)
+        if got_magic != magic or got_version != version:
+            raise ValueError(f'{self.path} is not a version {version} {magic.decode()} file')
+        self.toc = json.loads(self.mm[HEADER.size:HEADER.size + toc_len])
+
+    def section(self, name):
+        """(offset, length) of a section within the mapping."""
+        start, length = self.toc['sections'][name]
+        return start, length
+
+    def view(self, name, fmt='B'):
+        """Zero-copy memoryview of a section, cast to a struct format (e.g. 'Q', 'd')."""
+        start, length = self.section(name)
+        mv = memoryview(self.mm)[start:start + length]
+        return mv.cast(fmt) if fmt != 'B' else mv
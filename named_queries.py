@@ -0,0 +1,139 @@
+"""Named SQL statements from `queries.sql`.
+
+`queries.sql` holds any number of statements. A `-- name: <name>` comment
+starts a named statement; other comment lines directly after it become its
+description (except `-- advisor: ...` directives for tools/query_advisor.py).
+Parameters use SQLite's named style (`:state`):
+
+    -- name: roster_by_state
+    -- Players whose college is in one state.
+    SELECT name, position, college FROM players_resolved WHERE state = :state;
+
+The map (`app.py` snapshot, `generate_players_geojson.py`) uses the statement
+named `players`, or the first statement when none has that name, so a file
+with a single unnamed SELECT keeps working. Named statements are also served
+by `app.py` as `/api/query/<name>`.
+
+`load()` caches the parsed file per process and re-parses it only when its
+size or mtime changes.
+"""
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+import mmapfile
+
+MAP_QUERY = 'players'
+NAME_RE = re.compile(r'^\s*--\s*name:\s*([A-Za-z_][\w]*)\s*$')
+COMMENT_RE = re.compile(r'^\s*--\s?(.*)$')
+PARAM_RE = re.compile(r':([A-Za-z_]\w*)')
+
+
+class Query:
+    def __init__(self, name, sql, lineno, description='', raw=None):
+        self.name = name
+        self.sql = sql
+        self.raw = raw if raw is not None else sql  # statement text including its comments
+        self.lineno = lineno
+        self.description = description
+        self.params = params_of(sql)
+
+    def __repr__(self):
+        return f'Query({self.name!r}, line {self.lineno})'
+
+
+def params_of(sql):
+    """Named parameters of `sql` in order of first use (string literals and comments ignored)."""
+    clean = re.sub(r"'(?:[^']|'')*'", "''", sql)
+    clean = re.sub(r'--[^\n]*', ' ', clean)
+    return list(dict.fromkeys(PARAM_RE.findall(clean)))
+
+
+def split_statements(text):
+    """[(line number, statement)] for each complete SQL statement in `text`.
+
+    A trailing statement without a semicolon is included; comment-only chunks are not.
+    """
+    out = []
+    buf = []
+    start = None
+    for lineno, line in enumerate(text.splitlines(), 1):
+        if start is None and not line.strip():
+            continue
+        if start is None:
+            start = lineno
+        buf.append(line)
+        chunk = '\n'.join(buf)
+        if sqlite3.complete_statement(chunk):
+            out.append((start, chunk.strip()))
+            buf, start = [], None
+    tail = '\n'.join(buf).strip()
+    if tail and any(not COMMENT_RE.match(line) for line in tail.splitlines() if line.strip()):
+        out.append((start, tail))
+    return out
+
+
+def parse(text):
+    """Parse queries.sql text into a list of Query (unnamed statements get name None)."""
+    queries = []
+    seen = set()
+    for lineno, stmt in split_statements(text):
+        name = None
+        description = []
+        body = []
+        for line in stmt.splitlines():
+            m = NAME_RE.match(line)
+            if m and not body:
+                name = m.group(1)
+                continue
+            c = COMMENT_RE.match(line)
+            if c and name and not body:
+                if not c.group(1).strip().startswith('advisor:'):
+                    description.append(c.group(1).strip())
+                continue
+            body.append(line)
+        if name and name in seen:
+            raise ValueError(f'queries.sql line {lineno}: duplicate query name {name!r}')
+        seen.add(name)
+        sql = '\n'.join(body).strip().rstrip(';').strip()
+        queries.append(Query(name, sql, lineno, ' '.join(d for d in description if d), stmt))
+    return queries
+
+
+class QueryFile:
+    def __init__(self, path, queries, stamp):
+        self.path = Path(path)
+        self.queries = queries
+        self.stamp = stamp
+        self.by_name = {q.name: q for q in queries if q.name}
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def map_query(self):
+        """The statement the map is built from: `players`, else the first statement."""
+        q = self.by_name.get(MAP_QUERY)
+        if q is None and self.queries:
+            q = self.queries[0]
+        if q is None:
+            raise ValueError(f'{self.path} has no SQL statements')
+        return q
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load(path):
+    """Parsed `path` (a QueryFile), re-parsed only when the file changes."""
+    path = Path(path)
+    stamp = mmapfile.file_stamp(path)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached.stamp == stamp:
+            return cached
+    qf = QueryFile(path, parse(path.read_text(encoding='utf-8')), stamp)
+    with _cache_lock:
+        _cache[path] = qf
+    return qf
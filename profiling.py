@@ -0,0 +1,200 @@
+"""Shared `--profile` support for the offline pipeline scripts.
+
+Usage inside a script:
+
+    parser = argparse.ArgumentParser()
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    prof = profiling.from_args(args, 'csv_to_sqlite')
+    with prof.stage('read_csv'):
+        ...
+    prof.report()
+
+When profiling is off, `stage()` is just a wall-clock timer and `report()`
+prints nothing. With `--profile`, each stage additionally:
+- runs under cProfile (`--profile` / `--profile cprofile`) and dumps
+  `<script>.<stage>.pstats`, or under a stack sampler (`--profile sample`)
+- records CPU time and the tracemalloc peak for the stage plus the process
+  peak RSS
+- writes flamegraph-compatible collapsed stacks to `<script>.<stage>.collapsed`
+  (from the sampler, or derived from the cProfile call graph)
+
+Outputs go to `--profile-dir` (default `profile_out/`) and a summary table is
+printed by `report()`.
+"""
+import cProfile
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_DIR = Path(__file__).resolve().parent / 'profile_out'
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=['cprofile', 'sample'],
+                        help='profile each stage (cProfile by default, or a stack sampler)')
+    parser.add_argument('--profile-dir', default=str(DEFAULT_DIR),
+                        help='where to write .pstats / .collapsed files (default: profile_out/)')
+    parser.add_argument('--profile-interval', type=float, default=0.005,
+                        help='sampling interval in seconds for --profile sample (default: 0.005)')
+
+
+def from_args(args, script):
+    return Profiler(script, mode=args.profile, out_dir=args.profile_dir,
+                    interval=args.profile_interval)
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _frame_label(code):
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+class _StackSampler(threading.Thread):
+    """Periodically snapshot one thread's Python stack into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _collapsed_from_pstats(stats):
+    """Approximate collapsed stacks from a cProfile call graph.
+
+    cProfile only keeps caller->callee edges, so each function's own time is
+    attributed along its heaviest caller chain. Good enough to spot hot paths in
+    a flamegraph; use `--profile sample` for exact stacks.
+    """
+    raw = stats.stats  # func -> (cc, nc, tt, ct, callers)
+
+    def label(func):
+        filename, _, name = func
+        return f'{os.path.basename(filename)}:{name}'
+
+    def heaviest_caller(func):
+        callers = raw[func][4]
+        best = None
+        best_ct = -1.0
+        for caller, info in callers.items():
+            ct = info[3] if isinstance(info, tuple) else 0.0
+            if caller in raw and ct > best_ct:
+                best, best_ct = caller, ct
+        return best
+
+    out = Counter()
+    for func, (cc, nc, tt, ct, callers) in raw.items():
+        us = int(tt * 1_000_000)
+        if us <= 0:
+            continue
+        chain = [label(func)]
+        seen = {func}
+        cur = heaviest_caller(func)
+        while cur is not None and cur not in seen and len(chain) < 64:
+            seen.add(cur)
+            chain.append(label(cur))
+            cur = heaviest_caller(cur)
+        out[';'.join(reversed(chain))] += us
+    return out
+
+
+class Profiler:
+    def __init__(self, script, mode=None, out_dir=DEFAULT_DIR, interval=0.005):
+        self.script = script
+        self.mode = mode
+        self.out_dir = Path(out_dir)
+        self.interval = interval
+        self.rows = []
+        self._started = time.perf_counter()
+        if self.mode:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        prof = sampler = None
+        if self.mode:
+            tracemalloc.reset_peak()
+            if self.mode == 'sample':
+                sampler = _StackSampler(threading.get_ident(), self.interval)
+                sampler.start()
+            else:
+                prof = cProfile.Profile()
+                prof.enable()
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
+            if sampler is not None:
+                sampler.stop()
+            row = {
+                'stage': name,
+                'wall_s': time.perf_counter() - wall0,
+                'cpu_s': time.process_time() - cpu0,
+                'py_peak_mb': None,
+                'rss_peak_mb': None,
+            }
+            if self.mode:
+                row['py_peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                row['rss_peak_mb'] = _peak_rss_mb()
+                self._dump(name, prof, sampler)
+            self.rows.append(row)
+
+    def _dump(self, name, prof, sampler):
+        base = self.out_dir / f'{self.script}.{name}'
+        if prof is not None:
+            prof.dump_stats(str(base) + '.pstats')
+            stacks = _collapsed_from_pstats(pstats.Stats(prof))
+        else:
+            stacks = sampler.stacks
+        with open(str(base) + '.collapsed', 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def report(self, file=None):
+        file = file or sys.stdout
+        total = time.perf_counter() - self._started
+        if not self.mode or not self.rows:
+            return
+        print(f'\n{self.script} stage timings (profile: {self.mode}, output: {self.out_dir})', file=file)
+        header = f'{"stage":<28} {"wall s":>9} {"cpu s":>9} {"% wall":>7} {"py peak MB":>11} {"rss peak MB":>12}'
+        print(header, file=file)
+        print('-' * len(header), file=file)
+        for r in self.rows:
+            py_peak = f'{r["py_peak_mb"]:.1f}' if r['py_peak_mb'] is not None else '-'
+            rss_peak = f'{r["rss_peak_mb"]:.1f}' if r['rss_peak_mb'] is not None else '-'
+            pct = 100.0 * r['wall_s'] / total if total else 0.0
+            print(f'{r["stage"]:<28} {r["wall_s"]:>9.3f} {r["cpu_s"]:>9.3f} {pct:>6.1f}% {py_peak:>11} {rss_peak:>12}', file=file)
+        print('-' * len(header), file=file)
+        print(f'{"total":<28} {total:>9.3f}', file=file)
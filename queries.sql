@@ -1,2 +1,27 @@
+-- name: players
+-- One row per player for the map (app.py snapshot and generate_players_geojson.py).
 SELECT name, position, college, college_address, city, state, team_status
-FROM combined_table
\ No newline at end of file
+FROM players_resolved
+ORDER BY player_id;
+
+-- name: roster_by_state
+-- Players whose college is in the given state (e.g. ?state=PA).
+SELECT name, position, college, city, team_status
+FROM players_resolved
+WHERE state = :state
+ORDER BY name;
+
+-- name: players_by_college
+-- Players from one college, matched on the exact college name.
+SELECT name, position, team_status
+FROM players_resolved
+WHERE college = :college
+ORDER BY name;
+
+-- name: counts_by_status
+-- Number of players per team_status.
+-- advisor: allow temp-btree
+SELECT team_status, count(*) AS players
+FROM players_resolved
+GROUP BY team_status
+ORDER BY players DESC;
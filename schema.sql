@@ -0,0 +1,165 @@
+-- Normalized schema for combined_table.db (applied by csv_to_sqlite.py).
+--
+-- Each scraped (team, season) is one partition of roster_entries; reloading a
+-- team/season replaces only its own rows. Colleges, players and source URLs are
+-- stored once and referenced by id. The `combined_table` view reproduces the
+-- old flat table so queries.sql keeps working unchanged.
+
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS teams (
+    team_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS seasons (
+    season_id INTEGER PRIMARY KEY,
+    year INTEGER NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS sources (
+    source_id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS colleges (
+    college_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,            -- college as written on the roster/draft page
+    address TEXT NOT NULL DEFAULT '',  -- address/city/state as geocoded at load ('' if unresolved)
+    city TEXT NOT NULL DEFAULT '',
+    state TEXT NOT NULL DEFAULT '',
+    source_id INTEGER REFERENCES sources(source_id),
+    UNIQUE (name, address, city, state)
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    player_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL UNIQUE  -- lower(trim(name)); one player per key
+);
+
+CREATE TABLE IF NOT EXISTS roster_entries (
+    entry_id INTEGER PRIMARY KEY,
+    team_id INTEGER NOT NULL REFERENCES teams(team_id),
+    season_id INTEGER NOT NULL REFERENCES seasons(season_id),
+    player_id INTEGER NOT NULL REFERENCES players(player_id),
+    college_id INTEGER REFERENCES colleges(college_id),
+    position TEXT NOT NULL DEFAULT '',
+    team_status TEXT NOT NULL DEFAULT '',
+    source_id INTEGER REFERENCES sources(source_id)
+);
+
+-- partition lookups (reload/delete of one team-season) and team/season filters;
+-- covers the columns combined_table needs from roster_entries
+CREATE INDEX IF NOT EXISTS idx_roster_team_season
+    ON roster_entries(team_id, season_id, player_id, college_id, position, team_status, source_id);
+-- per-player lookups (dedup/merge, "which teams has X played for")
+CREATE INDEX IF NOT EXISTS idx_roster_player ON roster_entries(player_id, team_status);
+CREATE INDEX IF NOT EXISTS idx_roster_college ON roster_entries(college_id);
+-- replaces the old idx_combined_name on the flat table
+CREATE INDEX IF NOT EXISTS idx_players_name ON players(name);
+CREATE INDEX IF NOT EXISTS idx_colleges_state ON colleges(state, city);
+
+CREATE VIEW IF NOT EXISTS combined_table AS
+SELECT
+    p.name AS name,
+    re.position AS position,
+    c.name AS college,
+    c.address AS college_address,
+    c.city AS city,
+    c.state AS state,
+    re.team_status AS team_status,
+    ps.url AS player_source,
+    cs.url AS college_source,
+    t.name AS team,
+    s.year AS season
+FROM roster_entries re
+JOIN players p ON p.player_id = re.player_id
+JOIN teams t ON t.team_id = re.team_id
+JOIN seasons s ON s.season_id = re.season_id
+LEFT JOIN colleges c ON c.college_id = re.college_id
+LEFT JOIN sources ps ON ps.source_id = re.source_id
+LEFT JOIN sources cs ON cs.source_id = c.source_id;
+
+-- One row per player with duplicates merged, as the map shows them: distinct
+-- positions sorted and '/'-joined, and team_status/college taken from the best
+-- entry (Player > Free Agent > Draft, first loaded wins ties).
+-- players_resolved_source computes it; players_resolved materializes it and is
+-- kept current per player by the triggers below.
+CREATE VIEW IF NOT EXISTS players_resolved_source AS
+SELECT
+    p.player_id AS player_id,
+    p.name AS name,
+    COALESCE((SELECT group_concat(position, '/') FROM (
+        SELECT DISTINCT rp.position AS position FROM roster_entries rp
+        WHERE rp.player_id = p.player_id AND rp.position <> ''
+        ORDER BY rp.position)), '') AS position,
+    best.team_status AS team_status,
+    CASE lower(trim(best.team_status))
+        WHEN 'player' THEN 3 WHEN 'free agent' THEN 2 WHEN 'draft' THEN 1 ELSE 0 END AS status_rank,
+    c.name AS college,
+    c.address AS college_address,
+    c.city AS city,
+    c.state AS state,
+    best.college_id AS college_id,
+    best.entry_id AS best_entry_id
+FROM players p
+JOIN roster_entries best ON best.entry_id = (
+    SELECT rb.entry_id FROM roster_entries rb
+    WHERE rb.player_id = p.player_id
+    ORDER BY CASE lower(trim(rb.team_status))
+        WHEN 'player' THEN 3 WHEN 'free agent' THEN 2 WHEN 'draft' THEN 1 ELSE 0 END DESC,
+        rb.entry_id
+    LIMIT 1)
+LEFT JOIN colleges c ON c.college_id = best.college_id;
+
+CREATE TABLE IF NOT EXISTS players_resolved (
+    player_id INTEGER PRIMARY KEY REFERENCES players(player_id),
+    name TEXT NOT NULL,
+    position TEXT NOT NULL DEFAULT '',
+    team_status TEXT NOT NULL DEFAULT '',
+    status_rank INTEGER NOT NULL DEFAULT 0,
+    college TEXT,
+    college_address TEXT,
+    city TEXT,
+    state TEXT,
+    college_id INTEGER REFERENCES colleges(college_id),
+    best_entry_id INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_resolved_name ON players_resolved(name);
+-- filters used by the named queries in queries.sql (checked by tools/query_advisor.py)
+CREATE INDEX IF NOT EXISTS idx_resolved_state ON players_resolved(state, name);
+CREATE INDEX IF NOT EXISTS idx_resolved_college ON players_resolved(college, name);
+
+CREATE TRIGGER IF NOT EXISTS trg_resolved_after_insert AFTER INSERT ON roster_entries
+BEGIN
+    DELETE FROM players_resolved WHERE player_id = NEW.player_id;
+    INSERT INTO players_resolved SELECT * FROM players_resolved_source WHERE player_id = NEW.player_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resolved_after_delete AFTER DELETE ON roster_entries
+BEGIN
+    DELETE FROM players_resolved WHERE player_id = OLD.player_id;
+    INSERT INTO players_resolved SELECT * FROM players_resolved_source WHERE player_id = OLD.player_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resolved_after_update AFTER UPDATE ON roster_entries
+BEGIN
+    DELETE FROM players_resolved WHERE player_id IN (OLD.player_id, NEW.player_id);
+    INSERT INTO players_resolved SELECT * FROM players_resolved_source
+        WHERE player_id IN (OLD.player_id, NEW.player_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resolved_player_name AFTER UPDATE OF name ON players
+BEGIN
+    UPDATE players_resolved SET name = NEW.name WHERE player_id = NEW.player_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_resolved_college AFTER UPDATE OF college_id, name, address, city, state ON colleges
+BEGIN
+    UPDATE players_resolved
+    SET college_id = NEW.college_id, college = NEW.name, college_address = NEW.address,
+        city = NEW.city, state = NEW.state
+    WHERE college_id = OLD.college_id;
+END;
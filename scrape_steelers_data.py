@@ -8,16 +8,45 @@ Assumes the following files are present in repo root:
 - raw_steelers.html
 - college_raw.csv
 
-Run: python3 scrape_steelers_data.py
+The team and season default to the 2025 Pittsburgh Steelers and are written to
+the `team` / `season` columns of combined_table.csv, which csv_to_sqlite.py uses
+to partition the database.
+
+Outputs are written in one streaming pass: player rows flow through generators
+straight into `csv.DictWriter`s (and, with `--load-db`, into
+`csv_to_sqlite.load_rows`), so no intermediate lists or DataFrames are built.
+colleges.csv is only rewritten when college_raw.csv is newer than it.
+
+Run: python3 scrape_steelers_data.py [--team NAME] [--season YEAR] [--load-db [DB]] [--profile [cprofile|sample]]
 """
+import argparse
+import contextlib
 import csv
+import os
 import re
+import unicodedata
+from collections import Counter
 from pathlib import Path
 from bs4 import BeautifulSoup
-import pandas as pd
+
+import csv_to_sqlite
+import gazetteer
+import profiling
 
 ROOT = Path(__file__).resolve().parent
 
+DEFAULT_TEAM = 'Pittsburgh Steelers'
+DEFAULT_SEASON = 2025
+COMBINED_FIELDS = ['name','position','college','college_address','city','state','team_status','player_source','college_source','team','season']
+PLAYER_FIELDS = ['name','position','college','team_status','source_url']
+PLAYER_CSVS = {'Draft': 'draft_picks.csv', 'Free Agent': 'free_agents.csv', 'Player': 'current_roster.csv'}
+COLLEGE_SOURCE = 'https://databayou.com/usofa/colleges.html'
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+
+
+def season_url(team, season):
+    return f"https://en.wikipedia.org/wiki/{season}_{team.replace(' ', '_')}_season"
+
 
 def normalize_name(n):
     if not n:
@@ -180,11 +209,13 @@ def parse_steelers_roster(steelers_html_path):
     html = steelers_html_path.read_text(encoding="utf-8")
     soup = BeautifulSoup(html, "lxml")
     mapping = {}
-    # Find the roster table by class 'd3-o-table' and header 'College'
-    table = soup.find('table', class_=lambda c: c and 'd3-o-table' in c)
-    if not table:
-        return mapping
-    rows = table.find('tbody').find_all('tr')
+    # Roster tables (Active, Reserve/Injured, Practice Squad, ...) have class 'd3-o-table'
+    # and a 'College' column; players on reserve or the practice squad are on the roster too
+    rows = []
+    for table in soup.find_all('table', class_=lambda c: c and 'd3-o-table' in c):
+        tbody = table.find('tbody')
+        if tbody:
+            rows.extend(tbody.find_all('tr'))
     for tr in rows:
         name_tag = tr.find('span', class_='nfl-o-roster__player-name')
         if not name_tag:
@@ -199,132 +230,255 @@ def parse_steelers_roster(steelers_html_path):
     return mapping
 
 
-def load_databayou_colleges(college_csv_path):
-    # read the CSV as provided by databayou (college_raw.csv)
-    # databayou CSV contains characters that may not be UTF-8; read with latin1 to be forgiving
-    df = pd.read_csv(college_csv_path, dtype=str, encoding='latin1', on_bad_lines='skip')
-    # normalize column names: Name, ADDR, CITY, State
-    df = df.rename(columns={c: c.strip() for c in df.columns})
-    # Keep only requested columns
-    cols = [c for c in ['Name', 'ADDR', 'CITY', 'State'] if c in df.columns]
-    out = df[cols].copy()
-    out = out.fillna('')
-    return out
+def college_record(colleges, i):
+    # the subset of databayou columns the outputs use, keyed like the CSV header
+    return {'Name': colleges.value('name', i), 'ADDR': colleges.value('address', i),
+            'CITY': colleges.value('city', i), 'State': colleges.value('state', i)}
+
+
+def open_csv_writer(stack, path, fieldnames, **kwargs):
+    # a DictWriter (header written) on `path`, closed when `stack` exits
+    f = stack.enter_context(open(path, 'w', newline='', encoding='utf-8'))
+    writer = csv.DictWriter(f, fieldnames=fieldnames, **kwargs)
+    writer.writeheader()
+    return writer
 
 
-def write_csv_rows(path, rows, fieldnames):
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
+def write_colleges_csv(colleges, source_csv, path):
+    """Write colleges.csv (Name, ADDR, CITY, State, source_url) unless it is newer than `source_csv`.
+
+    Returns True when the file was rewritten. Rows are streamed to a temp file
+    that replaces the old one, so readers never see a partial file.
+    """
+    path = Path(path)
+    if path.exists() and path.stat().st_mtime_ns >= Path(source_csv).stat().st_mtime_ns:
+        return False
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['name', 'address', 'city', 'state', 'source_url'])
+        for i in range(len(colleges)):
+            writer.writerow([colleges.value(c, i) for c in ('name', 'address', 'city', 'state')]
+                            + [COLLEGE_SOURCE])
+    os.replace(tmp, path)
+    return True
+
+
+def player_rows(draft_rows, free_rows, roster_rows, source_url):
+    """Yield the output row of every draft pick, free agent and roster player, tagged with its team_status."""
+    for status, rows in (('Draft', draft_rows), ('Free Agent', free_rows), ('Player', roster_rows)):
         for r in rows:
-            writer.writerow(r)
+            yield {'name': r['name'], 'position': r.get('position', ''), 'college': r.get('college', ''),
+                   'team_status': status, 'source_url': source_url}
+
+
+def combined_rows(players, colleges, team, season, writers):
+    """Write each player row to `writers[team_status]` and yield a combined_table row when its college matches."""
+    matches = {}  # college text -> match_college() result; one lookup per distinct college
+    for p in players:
+        writers[p['team_status']].writerow(p)
+        college_text = p['college']
+        if college_text not in matches:
+            matches[college_text] = match_college(college_text, colleges)
+        matched = matches[college_text]
+        if matched:
+            yield {
+                'name': p['name'],
+                'position': p['position'],
+                'college': college_text,
+                'college_address': matched.get('ADDR', ''),
+                'city': matched.get('CITY', ''),
+                'state': matched.get('State', ''),
+                'team_status': p['team_status'],
+                'player_source': p['source_url'],
+                'college_source': COLLEGE_SOURCE,
+                'team': team,
+                'season': season,
+            }
+
 
+def tee_rows(rows, writer):
+    # write each row as it passes through to the next consumer
+    for r in rows:
+        writer.writerow(r)
+        yield r
 
-def match_college(player_college, colleges_df):
+
+def match_college(player_college, colleges):
     if not player_college or player_college.strip() == '':
         return None
     needle = player_college.lower()
-    # exact substring match on Name
-    for _, row in colleges_df.iterrows():
-        name = str(row['Name']).lower()
-        if needle in name or name in needle:
-            return row.to_dict()
+    # exact substring match on Name, either direction; first row wins
+    first = colleges.find_substring(needle)
+    names = colleges.column('name_key')
+    limit = first if first is not None else len(names)
+    for i in range(limit):
+        if names[i] in needle:
+            first = i
+            break
+    if first is not None:
+        return college_record(colleges, first)
     # try token match
     needle_tokens = set(re.findall(r"\w+", needle))
-    best = None
-    best_score = 0
-    for _, row in colleges_df.iterrows():
-        name = str(row['Name']).lower()
-        tokens = set(re.findall(r"\w+", name))
-        score = len(needle_tokens & tokens)
-        if score > best_score:
-            best_score = score
-            best = row.to_dict()
-    if best_score > 0:
-        return best
+    best = colleges.best_token_overlap(needle_tokens)
+    if best is not None:
+        return college_record(colleges, best)
     return None
 
 
-def main():
-    wiki = ROOT / 'raw_wikipedia.html'
-    steelers = ROOT / 'raw_steelers.html'
-    college_csv = ROOT / 'college_raw.csv'
-
-    draft_rows, free_rows = parse_wikipedia_draft_and_freeagents(wiki)
-    roster_rows = parse_wikipedia_roster(wiki)
-    steelers_map = parse_steelers_roster(steelers)
-    colleges_df = load_databayou_colleges(college_csv)
-
-    # enrich roster rows with college by matching to steelers.com mapping when possible
+def name_key(n):
+    """Normalized full name for joining rosters: ASCII lowercase, no punctuation,
+    no generational suffix, and leading initials merged ("T. J. Watt" -> "tj watt")."""
+    n = unicodedata.normalize('NFKD', n or '').encode('ascii', 'ignore').decode('ascii')
+    n = re.sub(r"\s+\(.+\)", "", n).lower().replace("'", '')
+    tokens = re.sub(r"[^a-z0-9\-]+", " ", n).split()
+    while len(tokens) > 1 and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    # merge a leading run of initials: "t j watt" -> "tj watt"
+    i = 0
+    while i < len(tokens) - 1 and len(tokens[i]) == 1:
+        i += 1
+    if i > 1:
+        tokens = [''.join(tokens[:i])] + tokens[i:]
+    return ' '.join(tokens)
+
+
+def build_name_index(steelers_map):
+    """Blocking index over steelers.com names: full key, (surname, first initial) and surname.
+
+    Built once, so matching a roster is linear in its length rather than
+    rescanning the whole map per player. Hyphenated surnames are indexed whole
+    ("smith-jones" never stands in for "smith").
+    """
+    index = {'full': {}, 'block': {}, 'surname': {}}
+    for raw_name, college in steelers_map.items():
+        key = name_key(raw_name)
+        tokens = key.split()
+        if not tokens:
+            continue
+        entry = (key, college)
+        index['full'].setdefault(key, []).append(entry)
+        index['block'].setdefault((tokens[-1], tokens[0][0]), []).append(entry)
+        index['surname'].setdefault(tokens[-1], []).append(entry)
+    return index
+
+
+def _one_college(entries):
+    """The college all `entries` agree on, else None."""
+    colleges = {college for _, college in entries}
+    return colleges.pop() if len(colleges) == 1 else None
+
+
+def _first_names_compatible(a, b):
+    # same first name, an initial of the other (j / jalen), or a short form of it (cam / cameron)
+    if a == b:
+        return True
+    if min(len(a), len(b)) == 1:
+        return a[0] == b[0]
+    return a.startswith(b) or b.startswith(a)
+
+
+def lookup_college(name, index):
+    """(college, method) for a roster name; method is exact/initial/surname/ambiguous/none.
+
+    Candidates sharing the surname and first initial must also have a
+    compatible first name (equal, an initial, or a short form); a bare surname
+    is only trusted when no other player has it. Another player's college is
+    never taken just because the surname matches.
+    """
+    key = name_key(name)
+    tokens = key.split()
+    if not tokens:
+        return '', 'none'
+    exact = index['full'].get(key)
+    if exact:
+        college = _one_college(exact)
+        return (college, 'exact') if college is not None else ('', 'ambiguous')
+    if len(tokens) == 1:
+        same_surname = index['surname'].get(tokens[0], ())
+        if len(same_surname) == 1:
+            return same_surname[0][1], 'surname'
+        return '', 'ambiguous' if same_surname else 'none'
+    first = tokens[0]
+    compatible = [e for e in index['block'].get((tokens[-1], first[0]), ())
+                  if _first_names_compatible(first, e[0].split()[0])]
+    if not compatible:
+        return '', 'none'
+    college = _one_college(compatible)
+    return (college, 'initial') if college is not None else ('', 'ambiguous')
+
+
+def enrich_roster(roster_rows, steelers_map):
+    """Fill each roster row's college from the steelers.com mapping; returns match counts by method."""
+    index = build_name_index(steelers_map)
+    methods = Counter()
     for r in roster_rows:
-        key = normalize_name(r['name'])
-        college = steelers_map.get(key, '')
-        if not college:
-            # try fuzzy match on last name
-            for k,v in steelers_map.items():
-                if k.split()[-1].lower() == key.split()[-1].lower():
-                    college = v
-                    break
+        college, method = lookup_college(r['name'], index)
+        methods[method] += 1
         r['college'] = college
+    return methods
 
-    # assign team_status and source_url
-    draft_out = []
-    for r in draft_rows:
-        r_out = {'name': r['name'], 'position': r['position'], 'college': r['college'], 'team_status': 'Draft', 'source_url': 'https://en.wikipedia.org/wiki/2025_Pittsburgh_Steelers_season'}
-        draft_out.append(r_out)
 
-    free_out = []
-    for r in free_rows:
-        r_out = {'name': r['name'], 'position': r['position'], 'college': r['college'], 'team_status': 'Free Agent', 'source_url': 'https://en.wikipedia.org/wiki/2025_Pittsburgh_Steelers_season'}
-        free_out.append(r_out)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--team', default=DEFAULT_TEAM, help=f'team name (default: {DEFAULT_TEAM})')
+    parser.add_argument('--season', type=int, default=DEFAULT_SEASON, help=f'season year (default: {DEFAULT_SEASON})')
+    parser.add_argument('--load-db', nargs='?', const=str(csv_to_sqlite.DB), metavar='DB',
+                        help='also load the combined rows into the SQLite DB in the same pass '
+                             '(replacing this team/season partition; default: combined_table.db)')
+    profiling.add_arguments(parser)
+    args = parser.parse_args(argv)
+    prof = profiling.from_args(args, 'scrape_steelers_data')
+    source_url = season_url(args.team, args.season)
 
-    roster_out = []
-    for r in roster_rows:
-        r_out = {'name': r['name'], 'position': r.get('position',''), 'college': r.get('college',''), 'team_status': 'Player', 'source_url': 'https://en.wikipedia.org/wiki/2025_Pittsburgh_Steelers_season'}
-        roster_out.append(r_out)
-
-    # Write individual CSVs
-    csv_fields = ['name','position','college','team_status','source_url']
-    write_csv_rows(ROOT / 'draft_picks.csv', draft_out, csv_fields)
-    write_csv_rows(ROOT / 'free_agents.csv', free_out, csv_fields)
-    write_csv_rows(ROOT / 'current_roster.csv', roster_out, csv_fields)
-
-    # colleges.csv: include Name, ADDR, CITY, State, and source_url
-    colleges_df_out = colleges_df.copy()
-    colleges_df_out['source_url'] = 'https://databayou.com/usofa/colleges.html'
-    colleges_df_out = colleges_df_out.rename(columns={'Name':'name','ADDR':'address','CITY':'city','State':'state'})
-    colleges_df_out.to_csv(ROOT / 'colleges.csv', index=False)
-
-    # combined_table.csv: merge players with college details, but only for colleges referenced by players
-    players_df = pd.DataFrame(draft_out + free_out + roster_out)
-    players_df['college_key'] = players_df['college'].fillna('').str.lower().str.strip()
-
-    combined_rows = []
-    for _, prow in players_df.iterrows():
-        college_text = prow['college']
-        matched = match_college(college_text, colleges_df)
-        if matched:
-            combined = {
-                'name': prow['name'],
-                'position': prow['position'],
-                'college': college_text,
-                'college_address': matched.get('ADDR',''),
-                'city': matched.get('CITY',''),
-                'state': matched.get('State',''),
-                'team_status': prow['team_status'],
-                'player_source': prow['source_url'],
-                'college_source': 'https://databayou.com/usofa/colleges.html'
-            }
-            combined_rows.append(combined)
+    wiki = ROOT / 'raw_wikipedia.html'
+    steelers = ROOT / 'raw_steelers.html'
+    college_csv = ROOT / 'college_raw.csv'
 
-    if combined_rows:
-        df_comb = pd.DataFrame(combined_rows)
-        df_comb.to_csv(ROOT / 'combined_table.csv', index=False)
-    else:
-        # write empty combined with headers
-        pd.DataFrame(columns=['name','position','college','college_address','city','state','team_status','player_source','college_source']).to_csv(ROOT / 'combined_table.csv', index=False)
+    with prof.stage('parse_draft_freeagents'):
+        draft_rows, free_rows = parse_wikipedia_draft_and_freeagents(wiki)
+    with prof.stage('parse_wikipedia_roster'):
+        roster_rows = parse_wikipedia_roster(wiki)
+    with prof.stage('parse_steelers_roster'):
+        steelers_map = parse_steelers_roster(steelers)
+    with prof.stage('load_colleges'):
+        colleges = gazetteer.load(college_csv)
+
+    with prof.stage('enrich_roster'):
+        methods = enrich_roster(roster_rows, steelers_map)
+    print(f"Matched {len(roster_rows) - methods['none'] - methods['ambiguous']}/{len(roster_rows)} roster players "
+          f"to a college ({', '.join(f'{k}={v}' for k, v in sorted(methods.items()))})")
+
+    with prof.stage('write_colleges_csv'):
+        if write_colleges_csv(colleges, college_csv, ROOT / 'colleges.csv'):
+            print('colleges.csv rewritten from college_raw.csv')
+
+    # one streaming pass: every player row goes to its per-status CSV, and those
+    # with a matched college on to combined_table.csv (and the DB with --load-db)
+    with prof.stage('match_and_write_combined'), contextlib.ExitStack() as stack:
+        writers = {status: open_csv_writer(stack, ROOT / filename, PLAYER_FIELDS)
+                   for status, filename in PLAYER_CSVS.items()}
+        combined_writer = open_csv_writer(stack, ROOT / 'combined_table.csv', COMBINED_FIELDS, lineterminator='\n')
+        players = player_rows(draft_rows, free_rows, roster_rows, source_url)
+        rows = combined_rows(players, colleges, args.team, args.season, writers)
+        rows = tee_rows(rows, combined_writer)
+        if args.load_db:
+            conn = csv_to_sqlite.connect(Path(args.load_db))
+            try:
+                csv_to_sqlite.ensure_schema(conn)
+                n = csv_to_sqlite.load_rows(conn, rows, colleges)
+                csv_to_sqlite.prune_orphans(conn)
+                conn.commit()
+                conn.execute('ANALYZE')
+            finally:
+                conn.close()
+            print(f'Loaded {n} roster entries into {args.load_db}')
+        else:
+            for _ in rows:
+                pass
 
     print('Wrote: draft_picks.csv, free_agents.csv, current_roster.csv, colleges.csv, combined_table.csv')
+    prof.report()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Pre-fork server for `app.py`: load the dataset once, then fork workers.
+
+The master process:
+- imports `app` and loads its Dataset (building `players.snapshot` if needed),
+  including the parts a worker would otherwise build on first use (gazetteer,
+  nearest-college grid, NumPy arrays, per-state counts); the snapshot is
+  memory-mapped and array-backed, so forked workers share its pages
+- runs `gc.freeze()` before forking so the workers' garbage collector never
+  writes to (and un-shares) the objects inherited from the master
+- opens the listening socket and forks `--workers` processes that all accept on it
+- polls the data sources (DB, college_raw.csv, queries.sql,
+  college_aliases.csv) every `--check-interval` seconds, and on SIGHUP; when
+  they change it rebuilds the snapshot, forks a new generation of workers on
+  the new data and then gracefully stops the old generation (in-flight
+  requests finish); a failed reload keeps the old generation and is retried
+  only once the sources change again, or on SIGHUP
+- restarts workers that die unexpectedly
+
+Workers never rebuild the snapshot themselves (their `app` data watcher thread
+is disabled); each generation serves exactly one data version. `/metrics`
+counters are per worker process.
+
+Run: python3 serve.py [--host 127.0.0.1] [--port 5000] [--workers N]
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# keep the collector from touching master objects until they are frozen
+gc.disable()
+
+import app  # noqa: E402
+
+
+def log(msg):
+    print(f'[serve {os.getpid()}] {msg}', file=sys.stderr, flush=True)
+
+
+def worker_main(sock):
+    from werkzeug.serving import make_server
+
+    # this generation serves the dataset inherited from the master
+    app.WATCH_DATA = False
+    gc.enable()
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *a: stopping.append(True))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    host, port = sock.getsockname()[:2]
+    srv = make_server(host, port, app.app, fd=sock.fileno())
+    srv.timeout = 0.5
+    while not stopping:
+        srv.handle_request()
+    os._exit(0)
+
+
+class Master:
+    def __init__(self, host, port, workers, check_interval):
+        self.workers = workers
+        self.check_interval = check_interval
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(128)
+        self.sock.set_inheritable(True)
+        self.children = {}  # pid -> generation
+        self.generation = 0
+        self.version = None
+        self.sources = None
+        self.failed_sources = None  # sources of the last failed reload
+        self.reload_requested = False
+        self.stopping = False
+
+    def load(self):
+        # rebuild if the sources changed, build the lazy parts (gazetteer, nearest-college
+        # grid, NumPy arrays, per-state counts) here so every worker shares one copy,
+        # then freeze everything loaded so far
+        ds = app.load_dataset()
+        if ds.colleges() is not None:
+            ds.college_grid()
+        ds.arrays()
+        ds.by_state()
+        self.version = ds.version
+        self.sources = ds.sources
+        gc.collect()
+        gc.freeze()
+        return ds
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker_main(self.sock)
+            finally:
+                os._exit(1)
+        self.children[pid] = self.generation
+        return pid
+
+    def stop_generation(self, generation):
+        for pid, g in list(self.children.items()):
+            if g == generation:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            generation = self.children.pop(pid, None)
+            if generation == self.generation and not self.stopping:
+                log(f'worker {pid} exited unexpectedly (status {status}); restarting')
+                self.spawn()
+
+    def maybe_reload(self):
+        sources = app.data_sources()
+        if not self.reload_requested and sources in (self.sources, self.failed_sources):
+            return
+        self.reload_requested = False
+        old_version, old_sources = self.version, self.sources
+        try:
+            ds = self.load()
+        except Exception as e:  # keep serving the old generation
+            self.failed_sources = sources
+            log(f'reload failed, keeping data version {old_version}: {e}')
+            return
+        self.failed_sources = None
+        # the version only hashes the map features; queries.sql or DB changes that leave
+        # them alone still change what workers serve (/api/query, cached results)
+        if ds.version == old_version and ds.sources == old_sources:
+            return
+        log(f'data sources changed (version {old_version} -> {ds.version}); forking new workers')
+        old_generation = self.generation
+        self.generation += 1
+        for _ in range(self.workers):
+            self.spawn()
+        self.stop_generation(old_generation)
+
+    def run(self):
+        ds = self.load()
+        host, port = self.sock.getsockname()[:2]
+        log(f'serving {ds.snap.n} features (data version {self.version}) on http://{host}:{port} '
+            f'with {self.workers} workers')
+        signal.signal(signal.SIGHUP, lambda *a: setattr(self, 'reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda *a: setattr(self, 'stopping', True))
+        signal.signal(signal.SIGINT, lambda *a: setattr(self, 'stopping', True))
+        for _ in range(self.workers):
+            self.spawn()
+        next_check = time.monotonic() + self.check_interval
+        while not self.stopping:
+            time.sleep(0.2)
+            self.reap()
+            if self.reload_requested or time.monotonic() >= next_check:
+                self.maybe_reload()
+                next_check = time.monotonic() + self.check_interval
+        log('shutting down')
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in list(self.children):
+            os.kill(pid, signal.SIGKILL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--check-interval', type=float, default=2.0,
+                        help='seconds between data-version checks (default: 2)')
+    args = parser.parse_args(argv)
+    Master(args.host, args.port, args.workers, args.check_interval).run()
+
+
+if __name__ == '__main__':
+    main()
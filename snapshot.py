@@ -0,0 +1,157 @@
+"""Ready-to-serve snapshot of the `/api/players` dataset (`players.snapshot`).
+
+`app.py` used to run queries.sql, load the colleges and geocode every row on
+each request. The snapshot stores the finished result instead, memory-mapped
+so it costs one `open()` at boot and its pages are shared by every worker:
+
+- `features.blob`: each GeoJSON feature pre-encoded exactly as `jsonify` would
+  (sorted keys, compact), followed by a comma; `features.offsets` indexes it
+- `search.blob`: per feature, the lowercased name, college, position and
+  team_status separated by NUL and terminated by a newline, so the `q` filter
+  is a `mmap.find` loop instead of lowercasing every row per request
+- `lon` / `lat`: float64 arrays, one entry per feature
+- `<field>.codes` for state, position and team_status: uint32 indexes into the
+  sorted distinct values listed in meta `categories`, so `/api/stats/*` can
+  aggregate with `np.bincount` instead of decoding every feature
+- meta: `sources` (size/mtime of the DB, college CSV, queries.sql and the
+  college aliases the snapshot was built from), `version`, a hash of the
+  contents, and `coverage`, the geocoding report of the build (geocode.py)
+
+Reading uses only the stdlib (no pandas/numpy). Building is done by
+`app.build_snapshot()`, which owns the query and geocoding logic.
+"""
+import bisect
+import hashlib
+import json
+from array import array
+
+import mmapfile
+
+MAGIC = b'SNP1'
+VERSION = 3
+SEARCH_FIELDS = ('name', 'college', 'position', 'team_status')
+CATEGORY_FIELDS = ('state', 'position', 'team_status')
+
+BODY_PREFIX = b'{"features":['
+BODY_SUFFIX = b'],"type":"FeatureCollection"}\n'
+
+
+def encode_feature(feature):
+    return json.dumps(feature, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def search_text(props):
+    parts = []
+    for k in SEARCH_FIELDS:
+        v = props.get(k)
+        parts.append(str(v).lower().replace('\n', ' ').replace('\0', ' ') if v else '')
+    return '\0'.join(parts) + '\n'
+
+
+def write(path, features, sources, coverage=None):
+    """Write `features` (GeoJSON Feature dicts, in response order) to `path`."""
+    feat_offsets = array('Q', [0])
+    search_offsets = array('Q', [0])
+    feat_parts = []
+    search_parts = []
+    lon = array('d')
+    lat = array('d')
+    values = {k: [] for k in CATEGORY_FIELDS}
+    for f in features:
+        b = encode_feature(f) + b','
+        feat_parts.append(b)
+        feat_offsets.append(feat_offsets[-1] + len(b))
+        s = search_text(f.get('properties') or {}).encode('utf-8')
+        search_parts.append(s)
+        search_offsets.append(search_offsets[-1] + len(s))
+        x, y = f['geometry']['coordinates'][:2]
+        lon.append(x)
+        lat.append(y)
+        props = f.get('properties') or {}
+        for k in CATEGORY_FIELDS:
+            v = props.get(k)
+            values[k].append('' if v is None else str(v))
+    categories = {k: sorted(set(v)) for k, v in values.items()}
+    feat_blob = b''.join(feat_parts)
+    search_blob = b''.join(search_parts)
+    meta = {
+        'rows': len(features),
+        'sources': sources,
+        'version': hashlib.sha1(feat_blob).hexdigest()[:16],
+        'categories': categories,
+        'coverage': coverage,
+    }
+    sections = [
+        ('features.blob', feat_blob),
+        ('features.offsets', feat_offsets.tobytes()),
+        ('search.blob', search_blob),
+        ('search.offsets', search_offsets.tobytes()),
+        ('lon', lon.tobytes()),
+        ('lat', lat.tobytes()),
+    ]
+    for k in CATEGORY_FIELDS:
+        code = {v: i for i, v in enumerate(categories[k])}
+        sections.append((k + '.codes', array('I', [code[v] for v in values[k]]).tobytes()))
+    return mmapfile.write(path, MAGIC, VERSION, meta, sections)
+
+
+def is_fresh(path, sources):
+    meta = mmapfile.read_meta(path, MAGIC, VERSION)
+    return meta is not None and meta.get('sources') == sources
+
+
+class Snapshot:
+    def __init__(self, path):
+        self._file = mmapfile.MappedFile(path, MAGIC, VERSION)
+        self._mm = self._file.mm
+        meta = self._file.toc
+        self.n = meta['rows']
+        self.sources = meta['sources']
+        self.version = meta['version']
+        self._feat_start, self._feat_len = self._file.section('features.blob')
+        self._feat_off = self._file.view('features.offsets', 'Q')
+        self._search_start, self._search_len = self._file.section('search.blob')
+        self._search_off = self._file.view('search.offsets', 'Q')
+        self.lon = self._file.view('lon', 'd')
+        self.lat = self._file.view('lat', 'd')
+        self.categories = meta['categories']
+        self.coverage = meta.get('coverage')
+
+    def codes(self, field):
+        """uint32 memoryview of `field` codes, indexing `self.categories[field]`."""
+        return self._file.view(field + '.codes', 'I')
+
+    def __len__(self):
+        return self.n
+
+    def match(self, q):
+        """Ascending ids of features whose search fields contain `q` (already lowercased)."""
+        q = q.replace('\n', ' ').replace('\0', ' ')
+        if not q:
+            return list(range(self.n))
+        key = q.encode('utf-8')
+        mm = self._mm
+        base = self._search_start
+        end = base + self._search_len
+        offsets = self._search_off
+        out = []
+        pos = mm.find(key, base, end)
+        while pos != -1:
+            i = bisect.bisect_right(offsets, pos - base) - 1
+            out.append(i)
+            pos = mm.find(key, base + offsets[i + 1], end)
+        return out
+
+    def feature_bytes(self, i):
+        a = self._feat_start + self._feat_off[i]
+        b = self._feat_start + self._feat_off[i + 1] - 1  # drop the trailing comma
+        return self._mm[a:b]
+
+    def body(self, ids=None):
+        """The FeatureCollection JSON for `ids` (all features when None)."""
+        if ids is None:
+            if not self.n:
+                return BODY_PREFIX + BODY_SUFFIX
+            start = self._feat_start
+            return BODY_PREFIX + self._mm[start:start + self._feat_len - 1] + BODY_SUFFIX
+        return BODY_PREFIX + b','.join(self.feature_bytes(i) for i in ids) + BODY_SUFFIX
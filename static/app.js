@@ -11,6 +11,19 @@ let markers = L.markerClusterGroup();
 map.addLayer(markers);
 
 let allFeatures = null;
+let markerById = [];     // feature index -> L.marker (null when the feature has no coordinates)
+let shownIds = new Set(); // feature indexes currently in the cluster layer
+let searcher = null;
+let searchGeneration = 0; // bumped by every search and dataset; older results are dropped
+// search_worker.js lives next to this script, which pages outside static/ load as static/app.js
+const SCRIPT_BASE = document.currentScript ? new URL('.', document.currentScript.src).href : '';
+
+const INDEX_CANDIDATES = [
+  'players_index.json',
+  './players_index.json',
+  '../players_index.json',
+  '/players_index.json'
+];
 
 async function fetchAnyJson(candidates){
   for (const u of candidates){
@@ -38,7 +51,7 @@ async function fetchPlayers(){
     try{
       const fc = JSON.parse(embedded.textContent || embedded.innerText || '{}');
       allFeatures = (fc && fc.features) ? fc.features : fc || [];
-      renderFeatures(allFeatures);
+      renderFeatures(allFeatures, fc && fc.data_version);
       return;
     }catch(e){
       console.warn('Failed to parse embedded players JSON, falling back to network fetch', e);
@@ -53,27 +66,126 @@ async function fetchPlayers(){
   ];
   const fc = await fetchAnyJson(candidates);
   allFeatures = (fc && fc.features) ? fc.features : fc || [];
-  renderFeatures(allFeatures);
+  renderFeatures(allFeatures, fc && fc.data_version);
+}
+
+function makeMarker(f){
+  if (!f || !f.geometry || !f.geometry.coordinates) return null;
+  const [lon, lat] = f.geometry.coordinates;
+  if (typeof lat !== 'number' || typeof lon !== 'number') return null;
+  const p = f.properties || {};
+  const marker = L.marker([lat, lon]);
+  const html = `<b>${escapeHtml(p.name)}</b><br>${escapeHtml(p.position || '')}<br>${escapeHtml(p.college || '')}<br><i>${escapeHtml(p.team_status || '')}</i>`;
+  marker.bindPopup(html);
+  return marker;
 }
 
-function renderFeatures(features){
+// dataVersion: players.geojson's data_version, which players_index.json must carry too
+function renderFeatures(features, dataVersion){
+  // new dataset: build every marker once, then filtering only adds/removes the difference
+  allFeatures = features;
+  searchGeneration++;
   markers.clearLayers();
-  features.forEach(f => {
-    if (!f || !f.geometry || !f.geometry.coordinates) return;
-    const [lon, lat] = f.geometry.coordinates;
-    if (typeof lat !== 'number' || typeof lon !== 'number') return;
-    const p = f.properties || {};
-    const marker = L.marker([lat, lon]);
-    const html = `<b>${escapeHtml(p.name)}</b><br>${escapeHtml(p.position || '')}<br>${escapeHtml(p.college || '')}<br><i>${escapeHtml(p.team_status || '')}</i>`;
-    marker.bindPopup(html);
-    markers.addLayer(marker);
-  });
-  if (features.length) {
+  shownIds = new Set();
+  markerById = features.map(makeMarker);
+  if (searcher) searcher.close();
+  searcher = createSearcher(features, dataVersion);
+  showIds(null);
+}
+
+// ids: null for all features, otherwise an iterable of feature indexes
+function showIds(ids){
+  const next = new Set();
+  if (ids === null){
+    for (let i = 0; i < markerById.length; i++) if (markerById[i]) next.add(i);
+  } else {
+    for (const i of ids) if (markerById[i]) next.add(i);
+  }
+  const toRemove = [];
+  const toAdd = [];
+  for (const i of shownIds) if (!next.has(i)) toRemove.push(markerById[i]);
+  for (const i of next) if (!shownIds.has(i)) toAdd.push(markerById[i]);
+  if (toRemove.length) markers.removeLayers(toRemove);
+  if (toAdd.length) markers.addLayers(toAdd);
+  shownIds = next;
+  if (next.size) {
     const group = markers.getBounds();
     if (group.isValid()) map.fitBounds(group, {maxZoom: 8});
   }
 }
 
+// Query players_index.json in a Web Worker; fall back to an in-page index built
+// from the features when workers or the prebuilt index are unavailable.
+function createSearcher(features, dataVersion){
+  const local = () => {
+    let index = null;
+    return {
+      query(q){
+        if (!index) index = SearchIndex.fromFeatures(features);
+        return Promise.resolve(index.query(q));
+      },
+      close(){}
+    };
+  };
+  if (typeof Worker === 'undefined') return local();
+  let worker;
+  try{
+    worker = new Worker(SCRIPT_BASE + 'search_worker.js');
+  }catch(e){
+    return local();
+  }
+  let seq = 0;
+  const pending = new Map();
+  let fallback = null;
+  let closed = false;
+  let markReady;
+  const ready = new Promise(resolve => {
+    markReady = resolve;
+    worker.onmessage = (e) => {
+      const msg = e.data || {};
+      if (msg.type === 'ready') resolve();
+      else if (msg.type === 'error'){
+        console.warn('Search index unavailable, indexing in the worker instead:', msg.message);
+        worker.postMessage({type: 'init', docs: SearchIndex.fromFeatures(features).docs});
+      } else if (msg.type === 'result'){
+        const done = pending.get(msg.seq);
+        pending.delete(msg.seq);
+        if (done) done(msg.ids);
+      }
+    };
+    worker.onerror = (e) => {
+      console.warn('Search worker failed, searching on the main thread', e);
+      fallback = local();
+      resolve();
+    };
+  });
+  // without a data_version (e.g. an older embedded blob) the index is checked by size only
+  worker.postMessage({type: 'init', urls: INDEX_CANDIDATES, expected: features.length,
+                      expectedVersion: dataVersion == null ? null : dataVersion});
+  return {
+    async query(q){
+      await ready;
+      if (closed) return undefined;
+      if (fallback) return fallback.query(q);
+      const id = ++seq;
+      // only the latest query matters; resolve older ones as stale
+      for (const [k, done] of pending){ done(undefined); pending.delete(k); }
+      return new Promise(resolve => {
+        pending.set(id, resolve);
+        worker.postMessage({type: 'query', q, seq: id});
+      });
+    },
+    // called when a new dataset replaces this one: stop the worker, settle waiting queries
+    close(){
+      closed = true;
+      worker.terminate();
+      for (const done of pending.values()) done(undefined);
+      pending.clear();
+      markReady();
+    }
+  };
+}
+
 function colorFromString(s){
   // placeholder preserved in case we re-enable coloring later
   return '#3388ff';
@@ -105,12 +217,13 @@ if (searchInput){
 }
 
 function filterAndRender(q){
-  if (!q) return renderFeatures(allFeatures);
-  const filtered = allFeatures.filter(f => {
-    const p = (f.properties || {});
-    return ['name','college','position','team_status'].some(k => (p[k]||'').toString().toLowerCase().includes(q));
+  // every call, including clearing the box, supersedes results still in flight
+  const generation = ++searchGeneration;
+  if (!q) return Promise.resolve(showIds(null));
+  return searcher.query(q).then(ids => {
+    // undefined: superseded inside the searcher; older generation: superseded here
+    if (ids !== undefined && generation === searchGeneration) showIds(ids);
   });
-  renderFeatures(filtered);
 }
 
 // initial load
@@ -0,0 +1,101 @@
+// Trigram search index over the map features, shared by app.js (fallback when
+// Web Workers are unavailable, e.g. file://) and search_worker.js.
+//
+// The index is built by generate_players_geojson.py as players_index.json:
+//   docs:  one lowercased string per feature (name, college, position, team_status
+//          joined with \u0001), in the same order as players.geojson
+//   grams: trigram -> delta-encoded, ascending feature ids
+//   data_version: the data_version of the players.geojson it was built with
+// Queries of 3+ characters intersect the trigram postings and then verify the
+// candidates with a substring check; shorter queries scan the prebuilt docs.
+(function(root){
+  const SEP = '\u0001';
+  const FIELDS = ['name', 'college', 'position', 'team_status'];
+
+  function decodePostings(deltas){
+    const out = new Int32Array(deltas.length);
+    let acc = 0;
+    for (let i = 0; i < deltas.length; i++){
+      acc += deltas[i];
+      out[i] = acc;
+    }
+    return out;
+  }
+
+  function intersect(a, b){
+    const out = new Int32Array(Math.min(a.length, b.length));
+    let i = 0, j = 0, k = 0;
+    while (i < a.length && j < b.length){
+      if (a[i] === b[j]){ out[k++] = a[i]; i++; j++; }
+      else if (a[i] < b[j]) i++;
+      else j++;
+    }
+    return out.subarray(0, k);
+  }
+
+  class SearchIndex {
+    constructor(data){
+      this.docs = data.docs || [];
+      this.grams = data.grams || null;
+      this.gramSize = data.gram_size || 3;
+      this.dataVersion = data.data_version == null ? null : data.data_version;
+      this.decoded = new Map();
+    }
+
+    static fromFeatures(features){
+      const docs = features.map(f => {
+        const p = (f && f.properties) || {};
+        return FIELDS.map(k => (p[k] || '').toString().toLowerCase()).join(SEP);
+      });
+      return new SearchIndex({docs});
+    }
+
+    get size(){ return this.docs.length; }
+
+    postings(gram){
+      let list = this.decoded.get(gram);
+      if (!list){
+        const raw = this.grams[gram];
+        list = raw ? decodePostings(raw) : new Int32Array(0);
+        this.decoded.set(gram, list);
+      }
+      return list;
+    }
+
+    // Returns null for "everything" (empty query) or an Int32Array of feature ids.
+    query(q){
+      q = (q || '').trim().toLowerCase();
+      if (!q) return null;
+      const docs = this.docs;
+      let candidates = null;
+      if (this.grams && q.length >= this.gramSize){
+        const seen = new Set();
+        const lists = [];
+        for (let i = 0; i + this.gramSize <= q.length; i++){
+          const g = q.slice(i, i + this.gramSize);
+          if (seen.has(g)) continue;
+          seen.add(g);
+          lists.push(this.postings(g));
+        }
+        lists.sort((a, b) => a.length - b.length);
+        candidates = lists[0];
+        for (let i = 1; i < lists.length && candidates.length; i++){
+          candidates = intersect(candidates, lists[i]);
+        }
+      }
+      const out = [];
+      if (candidates){
+        for (let i = 0; i < candidates.length; i++){
+          if (docs[candidates[i]].includes(q)) out.push(candidates[i]);
+        }
+      } else {
+        for (let i = 0; i < docs.length; i++){
+          if (docs[i].includes(q)) out.push(i);
+        }
+      }
+      return Int32Array.from(out);
+    }
+  }
+
+  root.SearchIndex = SearchIndex;
+})(typeof self !== 'undefined' ? self : this);
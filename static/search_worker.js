@@ -0,0 +1,50 @@
+// Runs SearchIndex queries off the main thread for app.js.
+//
+// Messages in:
+//   {type: 'init', urls: [...], expected: N, expectedVersion}
+//                                             load players_index.json from the first URL that works;
+//                                             its data_version must equal expectedVersion (its size N
+//                                             when no version is given)
+//   {type: 'init', docs: [...]}               build a gram-less index from docs sent by the page
+//   {type: 'query', q, seq}
+// Messages out:
+//   {type: 'ready', size} | {type: 'error', message} | {type: 'result', seq, ids}
+importScripts('search_index.js');
+
+let index = null;
+
+async function loadIndex(urls){
+  for (const u of urls){
+    try{
+      const res = await fetch(u);
+      if (!res.ok) continue;
+      return new SearchIndex(await res.json());
+    }catch(e){
+      continue;
+    }
+  }
+  throw new Error('Failed to fetch players_index.json');
+}
+
+self.onmessage = async (e) => {
+  const msg = e.data || {};
+  if (msg.type === 'init'){
+    try{
+      index = msg.docs ? new SearchIndex({docs: msg.docs}) : await loadIndex(msg.urls || []);
+      const stale = msg.expectedVersion != null
+        ? index.dataVersion !== msg.expectedVersion
+        : msg.expected != null && index.size !== msg.expected;
+      if (stale){
+        index = null;
+        throw new Error('players_index.json does not match players.geojson; regenerate both');
+      }
+      self.postMessage({type: 'ready', size: index.size});
+    }catch(err){
+      self.postMessage({type: 'error', message: String(err && err.message || err)});
+    }
+  } else if (msg.type === 'query'){
+    if (!index) return;
+    const ids = index.query(msg.q);
+    self.postMessage({type: 'result', seq: msg.seq, ids}, ids ? [ids.buffer] : []);
+  }
+};
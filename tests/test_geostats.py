@@ -0,0 +1,42 @@
+"""GridIndex.nearest against a brute-force scan of every point."""
+import numpy as np
+import pytest
+
+import geostats
+
+
+def brute_force(lon, lat, lon0, lat0, k):
+    dist = geostats.haversine_km(lon, lat, lon0, lat0)
+    dist = np.where(np.isnan(dist), np.inf, dist)
+    order = np.lexsort((np.arange(len(dist)), dist))[:k]
+    return [(int(i), float(dist[i])) for i in order if np.isfinite(dist[i])]
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = np.random.default_rng(7)
+    # mostly clustered like US colleges, plus points near the poles and the antimeridian
+    lon = np.concatenate([rng.uniform(-125, -67, 1500), rng.uniform(-180, 180, 300), rng.uniform(175, 180, 50)])
+    lat = np.concatenate([rng.uniform(25, 49, 1500), rng.uniform(-89.9, 89.9, 300), rng.uniform(-10, 10, 50)])
+    lon[::97] = np.nan  # rows without coordinates are skipped
+    return lon, lat
+
+
+@pytest.mark.parametrize('k', [1, 5, 25])
+def test_nearest_matches_brute_force(points, k):
+    lon, lat = points
+    grid = geostats.GridIndex(lon, lat)
+    rng = np.random.default_rng(k)
+    origins = [(rng.uniform(-180, 180), rng.uniform(-90, 90)) for _ in range(100)]
+    origins += [(-179.9, 0.0), (179.9, 5.0), (0.0, 89.99), (0.0, -89.99), (-79.9959, 40.4406)]
+    for lon0, lat0 in origins:
+        got = grid.nearest(lon0, lat0, k)
+        want = brute_force(lon, lat, lon0, lat0, k)
+        assert [i for i, _ in got] == [i for i, _ in want], (lon0, lat0)
+        assert np.allclose([d for _, d in got], [d for _, d in want])
+
+
+def test_k_larger_than_points():
+    grid = geostats.GridIndex([0.0, 1.0, np.nan], [0.0, 1.0, 2.0])
+    assert [i for i, _ in grid.nearest(0.2, 0.2, 10)] == [0, 1]
+    assert geostats.GridIndex([], []).nearest(0.0, 0.0, 3) == []
@@ -0,0 +1,67 @@
+"""Roster -> steelers.com name matching (scrape_steelers_data.lookup_college)."""
+import pytest
+
+pytest.importorskip('bs4')
+import scrape_steelers_data as scrape  # noqa: E402
+
+STEELERS_MAP = {
+    'Jordan Smith': 'Alabama',
+    'Jaylen Johnson': 'LSU',
+    'Mike Williams': 'Clemson',
+    'Michael Williams': 'Georgia',
+    'T.J. Watt': 'Wisconsin',
+    'Cameron Heyward': 'Ohio State',
+    'Najee Harris Jr.': 'Alabama',
+    'Brodric Martin-Rhodes': 'Western Kentucky',
+    'Joey Porter': 'Penn State',
+    'José Núñez': 'Miami',
+}
+
+# (roster name, expected college, expected method)
+CASES = [
+    ('Jordan Smith', 'Alabama', 'exact'),
+    ('T. J. Watt', 'Wisconsin', 'exact'),
+    ('TJ Watt', 'Wisconsin', 'exact'),
+    ('Najee Harris', 'Alabama', 'exact'),
+    ('Najee Harris III', 'Alabama', 'exact'),
+    ('Jose Nunez', 'Miami', 'exact'),
+    ('Cam Heyward', 'Ohio State', 'initial'),
+    ('J. Smith', 'Alabama', 'initial'),
+    ('Heyward', 'Ohio State', 'surname'),
+    # another player's college is never taken on a shared surname or initial
+    ('Jalen Smith', '', 'none'),
+    ('Tyler Johnson', '', 'none'),
+    ('Kevin Williams', '', 'none'),
+    ('Daryl Porter', '', 'none'),
+    ('Jordan Smith-Jones', '', 'none'),
+    ('Brodric Martin', '', 'none'),
+    # two compatible candidates with different colleges
+    ('Mi Williams', '', 'ambiguous'),
+    ('M. Williams', '', 'ambiguous'),
+    ('Williams', '', 'ambiguous'),
+    ('Nobody Here', '', 'none'),
+    ('', '', 'none'),
+]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return scrape.build_name_index(STEELERS_MAP)
+
+
+@pytest.mark.parametrize('name, college, method', CASES)
+def test_lookup_college(index, name, college, method):
+    assert scrape.lookup_college(name, index) == (college, method)
+
+
+def test_name_key():
+    assert scrape.name_key('T. J. Watt') == 'tj watt'
+    assert scrape.name_key("De'Shawn Smith Jr.") == 'deshawn smith'
+    assert scrape.name_key('Calvin Austin III (PS)') == 'calvin austin'
+
+
+def test_enrich_roster_counts_methods():
+    rows = [{'name': 'Jordan Smith'}, {'name': 'Jalen Smith'}, {'name': 'Cam Heyward'}]
+    methods = scrape.enrich_roster(rows, STEELERS_MAP)
+    assert [r['college'] for r in rows] == ['Alabama', '', 'Ohio State']
+    assert methods == {'exact': 1, 'none': 1, 'initial': 1}
@@ -0,0 +1,57 @@
+"""queries.sql parsing: statement splitting, names, descriptions and parameters."""
+import pytest
+
+import named_queries
+
+TEXT = """\
+-- name: players
+-- Every resolved player; the map reads this one.
+SELECT name, college FROM players_resolved;
+
+-- name: semis
+-- advisor: allow temp-btree
+SELECT name FROM players_resolved
+WHERE college = 'A;B' -- trailing; comment
+  AND name <> 'it''s; fine'
+ORDER BY name;
+
+/* block; comment */ SELECT count(*) FROM players_resolved WHERE state = :state AND city = :city
+"""
+
+
+def test_split_statements_ignores_semicolons_in_strings_and_comments():
+    stmts = named_queries.split_statements(TEXT)
+    assert [line for line, _ in stmts] == [1, 5, 12]
+    assert stmts[1][1].endswith('ORDER BY name;')
+    # the last statement has no semicolon and is still included
+    assert stmts[2][1].startswith('/* block; comment */')
+
+
+def test_comment_only_tail_is_not_a_statement():
+    assert named_queries.split_statements('SELECT 1;\n-- just a note; really\n') == [(1, 'SELECT 1;')]
+
+
+def test_parse_names_descriptions_and_params():
+    queries = named_queries.parse(TEXT)
+    assert [q.name for q in queries] == ['players', 'semis', None]
+    assert queries[0].description == 'Every resolved player; the map reads this one.'
+    assert queries[1].description == ''  # advisor directives are not descriptions
+    assert "'it''s; fine'" in queries[1].sql
+    assert queries[2].params == ['state', 'city']
+
+
+def test_params_ignore_literals_and_comments():
+    sql = "SELECT ':nope' AS a FROM t WHERE x = :x -- :y\nAND z = :z AND x2 = :x"
+    assert named_queries.params_of(sql) == ['x', 'z']
+
+
+def test_duplicate_names_are_rejected():
+    with pytest.raises(ValueError, match='duplicate query name'):
+        named_queries.parse('-- name: a\nSELECT 1;\n-- name: a\nSELECT 2;\n')
+
+
+def test_map_query_falls_back_to_first_statement():
+    qf = named_queries.QueryFile('q.sql', named_queries.parse('SELECT 1;\n-- name: other\nSELECT 2;\n'), None)
+    assert qf.map_query().sql == 'SELECT 1'
+    qf = named_queries.QueryFile('q.sql', named_queries.parse(TEXT), None)
+    assert qf.map_query().name == 'players'
@@ -0,0 +1,77 @@
+"""players_resolved stays equal to players_resolved_source through loads, updates and pruning."""
+import pytest
+
+import csv_to_sqlite
+
+
+def row(name, position, college, status, team='Pittsburgh Steelers', season=2025):
+    return {'name': name, 'position': position, 'college': college, 'team_status': status,
+            'team': team, 'season': season}
+
+
+STEELERS = [
+    row('T.J. Watt', 'LB', 'Wisconsin', 'Player'),
+    row('Cam Heyward', 'DT', 'Ohio State', 'Player'),
+    row('Cam Heyward', 'DE', 'Ohio State', 'Free Agent'),
+    row('Kaleb Johnson', 'RB', 'Iowa', 'Draft'),
+]
+BROWNS = [
+    row('Kaleb Johnson', 'RB', 'Iowa', 'Player', team='Cleveland Browns'),
+    row('Myles Garrett', 'DE', 'Texas A&M', 'Player', team='Cleveland Browns'),
+]
+
+
+def assert_materialized(conn):
+    resolved = conn.execute('SELECT * FROM players_resolved ORDER BY player_id').fetchall()
+    source = conn.execute('SELECT * FROM players_resolved_source ORDER BY player_id').fetchall()
+    assert resolved == source
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = csv_to_sqlite.connect(tmp_path / 'combined_table.db')
+    csv_to_sqlite.ensure_schema(conn)
+    csv_to_sqlite.load_rows(conn, STEELERS)
+    yield conn
+    conn.close()
+
+
+def player_id(conn, name):
+    return conn.execute('SELECT player_id FROM players WHERE name = ?', (name,)).fetchone()[0]
+
+
+def test_load_of_a_new_partition(conn):
+    assert_materialized(conn)
+    csv_to_sqlite.load_rows(conn, BROWNS)
+    assert_materialized(conn)
+    # Kaleb Johnson's Browns roster spot outranks his Steelers draft entry
+    assert conn.execute("SELECT team_status FROM players_resolved WHERE name = 'Kaleb Johnson'").fetchone() == ('Player',)
+
+
+def test_reload_of_an_existing_partition(conn):
+    csv_to_sqlite.load_rows(conn, BROWNS)
+    csv_to_sqlite.load_rows(conn, [STEELERS[0], row('Kaleb Johnson', 'KR', 'Iowa', 'Player')])
+    assert_materialized(conn)
+    assert conn.execute("SELECT position FROM players_resolved WHERE name = 'Kaleb Johnson'").fetchone() == ('KR/RB',)
+
+
+def test_update_of_roster_entries(conn):
+    conn.execute("UPDATE roster_entries SET team_status = 'Draft' WHERE player_id = ? AND team_status = 'Player'",
+                 (player_id(conn, 'Cam Heyward'),))
+    assert_materialized(conn)
+    conn.execute('UPDATE roster_entries SET player_id = ? WHERE player_id = ?',
+                 (player_id(conn, 'T.J. Watt'), player_id(conn, 'Kaleb Johnson')))
+    assert_materialized(conn)
+
+
+def test_update_of_a_college(conn):
+    conn.execute("UPDATE colleges SET name = 'Wisconsin-Madison', city = 'Madison', state = 'WI' "
+                 "WHERE name = 'Wisconsin'")
+    assert_materialized(conn)
+
+
+def test_prune_orphans(conn):
+    csv_to_sqlite.load_rows(conn, STEELERS[:1])
+    csv_to_sqlite.prune_orphans(conn)
+    assert_materialized(conn)
+    assert conn.execute('SELECT count(*) FROM players_resolved').fetchone() == (1,)
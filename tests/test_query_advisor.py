@@ -0,0 +1,45 @@
+"""tools/query_advisor.py: queries.sql passes --check, and scans it cannot index for are flagged."""
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from tools import query_advisor
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def db(tmp_path):
+    # --check may create indexes inside savepoints; never touch the committed DB
+    path = tmp_path / 'combined_table.db'
+    shutil.copy(ROOT / 'combined_table.db', path)
+    return path
+
+
+def plan_issues(db, sql):
+    conn = sqlite3.connect(db)
+    try:
+        schema = query_advisor.Schema(conn)
+        return query_advisor.plan_issues(schema, sql, query_advisor.explain(conn, sql))
+    finally:
+        conn.close()
+
+
+def test_queries_sql_passes_check(db):
+    assert query_advisor.main(['--check', '--db', str(db), '--sql', str(ROOT / 'queries.sql'), '--runs', '1']) == 0
+
+
+def test_check_fails_on_a_scan_behind_an_unattributed_filter(db, tmp_path, capsys):
+    sql = tmp_path / 'bad.sql'
+    sql.write_text('-- name: search\nSELECT name FROM players_resolved WHERE lower(name) LIKE :q;\n')
+    assert query_advisor.main(['--check', '--db', str(db), '--sql', str(sql), '--runs', '1']) == 1
+    assert 'unattributed filter: lower(name) LIKE :q' in capsys.readouterr().out
+
+
+def test_unattributed_terms_ignore_plain_column_comparisons(db):
+    issues = plan_issues(db, "SELECT name FROM players_resolved WHERE team_status <> 'Draft'")
+    assert issues == []
+    issues = plan_issues(db, 'SELECT name FROM players_resolved WHERE substr(city, 1, 1) = :c')
+    assert [(kind, 'unattributed filter' in detail) for kind, detail, _ in issues] == [('scan', True)]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Measure how quickly a fresh app.py worker can serve its first request.
+
+Each run starts a new Python process that imports `app`, serves one
+`/api/players` request through Flask's test client and reports:
+- import time of `app` (ms)
+- time from process start of the import to the first response (ms)
+- RSS after the first response (MB, from /proc/self/status)
+- whether pandas / numpy ended up imported
+
+Modes:
+- warm: players.snapshot is up to date (the normal case for a new worker)
+- cold: players.snapshot is deleted before each run, so the worker rebuilds it
+
+Run: python3 tools/bench_startup.py [--runs 5] [--mode warm|cold|both] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r'''
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+resp = app.app.test_client().get('/api/players')
+t2 = time.perf_counter()
+rss_kb = 0
+try:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss_kb = int(line.split()[1])
+except OSError:
+    pass
+print(json.dumps({
+    'status': resp.status_code,
+    'import_ms': (t1 - t0) * 1000,
+    'first_response_ms': (t2 - t0) * 1000,
+    'rss_mb': rss_kb / 1024,
+    'pandas': 'pandas' in sys.modules,
+    'numpy': 'numpy' in sys.modules,
+}))
+'''
+
+
+def run_once(mode):
+    snap = ROOT / 'players.snapshot'
+    if mode == 'cold' and snap.exists():
+        snap.unlink()
+    out = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, capture_output=True, text=True,
+                         env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+    if out.returncode != 0:
+        raise SystemExit(f'benchmark child failed:\n{out.stderr}')
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(results):
+    def med(key):
+        return statistics.median(r[key] for r in results)
+    return {
+        'runs': len(results),
+        'import_ms': round(med('import_ms'), 1),
+        'first_response_ms': round(med('first_response_ms'), 1),
+        'rss_mb': round(med('rss_mb'), 1),
+        'pandas_imported': any(r['pandas'] for r in results),
+        'numpy_imported': any(r['numpy'] for r in results),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--mode', choices=['warm', 'cold', 'both'], default='both')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args(argv)
+
+    modes = ['cold', 'warm'] if args.mode == 'both' else [args.mode]
+    report = {}
+    for mode in modes:
+        if mode == 'warm':
+            run_once('warm')  # make sure the snapshot exists and is fresh
+        report[mode] = summarize([run_once(mode) for _ in range(args.runs)])
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f'{"mode":<6} {"import ms":>10} {"first resp ms":>14} {"rss MB":>8} {"pandas":>7} {"numpy":>6}')
+    for mode, r in report.items():
+        print(f'{mode:<6} {r["import_ms"]:>10.1f} {r["first_response_ms"]:>14.1f} {r["rss_mb"]:>8.1f} '
+              f'{str(r["pandas_imported"]):>7} {str(r["numpy_imported"]):>6}')
+
+
+if __name__ == '__main__':
+    main()
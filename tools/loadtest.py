@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""Load-test `/api/players` on a locally started app.py (or serve.py) and compare against a baseline.
+
+The tool starts the server on a free port, fetches the served players once and
+builds a seeded, repeatable request mix from them:
+- empty: `/api/players`, the initial map load
+- prefix: `/api/players?q=...`, typing sessions that send successive 1-4
+  character prefixes of a player, college, city, state or position value
+- bbox: `/api/players?bbox=west,south,east,north`, pan sessions that open a
+  viewport around a random player and move it a fraction of its size per step
+
+`--concurrency` client threads replay the mix with keep-alive connections for
+`--duration` seconds after `--warmup` seconds. The report has requests/s,
+latency percentiles (overall and per kind), errors (non-200 statuses and
+connection failures), and the server's CPU time and memory (PSS, falling back
+to RSS) summed over its process tree from /proc, sampled every 0.25 s.
+
+`--save-baseline FILE` writes the report; `--baseline FILE` prints the change
+against one and exits 1 when requests/s or CPU per request get worse, or p95
+latency grows, by more than `--max-regression` (default 15%), or the error
+rate rises. The client runs on the same box as the server, so compare
+baselines taken on the same machine with the same options.
+
+Run: python3 tools/loadtest.py [--server app|serve] [--workers N] [--concurrency 8]
+     [--duration 10] [--warmup 2] [--mix empty=2,prefix=5,bbox=3] [--seed 1]
+     [--baseline tools/loadtest_baseline.json] [--save-baseline FILE] [--json]
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import quote
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_MIX = 'empty=2,prefix=5,bbox=3'
+DEFAULT_BASELINE = ROOT / 'tools' / 'loadtest_baseline.json'
+PERCENTILES = (50, 90, 95, 99)
+SEARCH_FIELDS = ('name', 'college', 'city', 'state', 'position')
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+
+def parse_mix(value):
+    """'empty=2,prefix=5,bbox=3' -> {kind: weight}."""
+    mix = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in ('empty', 'prefix', 'bbox'):
+            raise argparse.ArgumentTypeError(f'unknown request kind {kind!r}')
+        mix[kind] = float(weight or 1)
+    if not any(w > 0 for w in mix.values()):
+        raise argparse.ArgumentTypeError('the mix needs at least one positive weight')
+    return mix
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(host, port, path, timeout=10.0):
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    finally:
+        conn.close()
+
+
+class Server:
+    """app.py (or serve.py) in a child process on a free port."""
+
+    def __init__(self, kind, workers, startup_timeout=120.0):
+        self.host = '127.0.0.1'
+        self.port = free_port()
+        if kind == 'serve':
+            cmd = [sys.executable, 'serve.py', '--port', str(self.port), '--workers', str(workers)]
+        else:
+            cmd = [sys.executable, 'app.py', '--port', str(self.port)]
+        self.log = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, cwd=ROOT, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if self.proc.poll() is not None:
+                raise SystemExit(f'server exited with status {self.proc.returncode}:\n{self.output()}')
+            try:
+                if get(self.host, self.port, '/api/players')[0] == 200:
+                    return
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                self.stop()
+                raise SystemExit(f'server did not answer within {startup_timeout:.0f}s:\n{self.output()}')
+            time.sleep(0.2)
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def output(self):
+        self.log.seek(0)
+        return self.log.read().decode('utf-8', 'replace')[-4000:]
+
+    def stop(self):
+        if self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGTERM)
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.log.close()
+
+
+def process_tree(pid):
+    """`pid` and all of its descendants (serve.py workers), from /proc."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    tree = [pid]
+    for p in tree:
+        tree.extend(children.get(p, ()))
+    return tree
+
+
+def cpu_seconds(pid):
+    # utime + stime of one process (fields 14 and 15 of /proc/<pid>/stat)
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLK_TCK
+
+
+def memory_kb(pid):
+    # proportional set size counts pages shared by forked workers once; RSS if unavailable
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+class ResourceSampler(threading.Thread):
+    """CPU time and memory of a process tree, sampled in the background."""
+
+    def __init__(self, pid, interval=0.25):
+        super().__init__(name='resource-sampler', daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu = {}  # pid -> last seen cpu seconds
+        self.start_cpu = None
+        self.memory_mb = []
+        self.stopped = threading.Event()
+
+    def sample(self):
+        total = 0
+        for pid in process_tree(self.pid):
+            try:
+                self.cpu[pid] = cpu_seconds(pid)
+                total += memory_kb(pid)
+            except (OSError, ValueError, IndexError):
+                continue  # exited between listing and reading
+        self.memory_mb.append(total / 1024)
+
+    def total_cpu(self):
+        # processes that exited keep their last sample
+        return sum(self.cpu.values())
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def begin(self):
+        self.sample()
+        self.start_cpu = self.total_cpu()
+        self.memory_mb = self.memory_mb[-1:]
+        self.start()
+
+    def finish(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+        return self.total_cpu() - self.start_cpu
+
+
+def build_requests(features, mix, seed, n=5000):
+    """[(kind, path)] of about `n` requests, grouped into typing and panning sessions."""
+    rng = random.Random(seed)
+    values = sorted({str(f['properties'].get(k) or '').strip()
+                     for f in features for k in SEARCH_FIELDS} - {''})
+    points = [f['geometry']['coordinates'] for f in features
+              if f.get('geometry') and f['geometry'].get('coordinates')]
+    kinds = [k for k, w in mix.items() if w > 0 and (k != 'prefix' or values) and (k != 'bbox' or points)]
+    weights = [mix[k] for k in kinds]
+    out = []
+    while len(out) < n:
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'empty':
+            out.append(('empty', '/api/players'))
+        elif kind == 'prefix':
+            # a user typing the start of a word, one request per keystroke
+            words = rng.choice(values).lower().split()
+            word = rng.choice(words)
+            for length in range(1, min(len(word), rng.randint(1, 4)) + 1):
+                out.append(('prefix', '/api/players?q=' + quote(word[:length])))
+        else:
+            # a user dragging the map: a viewport panned a few steps in one direction
+            lon, lat = rng.choice(points)
+            width = rng.uniform(4.0, 30.0)
+            height = width * 0.55
+            dx, dy = rng.uniform(-0.3, 0.3) * width, rng.uniform(-0.3, 0.3) * height
+            for _ in range(rng.randint(2, 6)):
+                west, east = max(lon - width / 2, -180.0), min(lon + width / 2, 180.0)
+                south, north = max(lat - height / 2, -90.0), min(lat + height / 2, 90.0)
+                out.append(('bbox', f'/api/players?bbox={west:.4f},{south:.4f},{east:.4f},{north:.4f}'))
+                lon, lat = lon + dx, min(max(lat + dy, -85.0), 85.0)
+    return out
+
+
+def client(host, port, requests, counter, warm_until, deadline, limit, results, timeout):
+    conn = None
+    while True:
+        i = next(counter)
+        if time.perf_counter() >= deadline or (limit and i >= limit):
+            break
+        kind, path = requests[i % len(requests)]
+        if conn is None:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        t0 = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+            if resp.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException) as e:
+            status = type(e).__name__
+            conn.close()
+            conn = None
+        t1 = time.perf_counter()
+        if t0 >= warm_until:
+            results.append((kind, t1 - t0, status, t1))
+    if conn is not None:
+        conn.close()
+
+
+def percentiles_ms(latencies):
+    if not latencies:
+        return {}
+    s = sorted(latencies)
+    out = {f'p{p}': round(s[min(len(s) - 1, int(len(s) * p / 100))] * 1000, 3) for p in PERCENTILES}
+    out['max'] = round(s[-1] * 1000, 3)
+    out['mean'] = round(sum(s) / len(s) * 1000, 3)
+    return out
+
+
+def summarize(results, elapsed, cpu, memory_mb):
+    n = len(results)
+    errors = Counter(str(status) for _, _, status, _ in results if status != 200)
+    n_errors = sum(errors.values())
+    by_kind = {}
+    for kind in sorted({r[0] for r in results}):
+        lat = [r[1] for r in results if r[0] == kind]
+        by_kind[kind] = {'requests': len(lat), 'latency_ms': percentiles_ms(lat)}
+    return {
+        'requests': n,
+        'seconds': round(elapsed, 3),
+        'rps': round(n / elapsed, 1) if elapsed else 0.0,
+        'error_rate': round(n_errors / n, 5) if n else 0.0,
+        'errors': dict(sorted(errors.items())),
+        'latency_ms': percentiles_ms([r[1] for r in results]),
+        'by_kind': by_kind,
+        'server': {
+            'cpu_seconds': round(cpu, 3),
+            'cpu_percent': round(cpu / elapsed * 100, 1) if elapsed else 0.0,
+            'cpu_ms_per_request': round(cpu / n * 1000, 3) if n else 0.0,
+            'memory_mb_peak': round(max(memory_mb), 1) if memory_mb else 0.0,
+            'memory_mb_mean': round(sum(memory_mb) / len(memory_mb), 1) if memory_mb else 0.0,
+        },
+    }
+
+
+def run(args):
+    server = Server(args.server, args.workers)
+    try:
+        status, body = get(server.host, server.port, '/api/players')
+        features = json.loads(body)['features']
+        requests = build_requests(features, args.mix, args.seed)
+        sampler = ResourceSampler(server.pid)
+        results = []
+        counter = itertools.count()
+        start = time.perf_counter()
+        warm_until = start + args.warmup
+        deadline = warm_until + args.duration
+        threads = [threading.Thread(target=client, daemon=True,
+                                    args=(server.host, server.port, requests, counter, warm_until, deadline,
+                                          args.requests, results, args.timeout))
+                   for _ in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        time.sleep(max(0.0, warm_until - time.perf_counter()))
+        sampler.begin()
+        measure_start = time.perf_counter()
+        for t in threads:
+            t.join()
+        cpu = sampler.finish()
+        elapsed = (max(r[3] for r in results) if results else time.perf_counter()) - measure_start
+    finally:
+        server.stop()
+    report = summarize(results, elapsed, cpu, sampler.memory_mb)
+    report['config'] = {
+        'server': args.server,
+        'workers': args.workers if args.server == 'serve' else 1,
+        'concurrency': args.concurrency,
+        'duration': args.duration,
+        'warmup': args.warmup,
+        'mix': args.mix,
+        'seed': args.seed,
+        'features': len(features),
+    }
+    report['machine'] = {
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+    return report
+
+
+def compare(report, baseline, max_regression):
+    """[(metric, baseline, current, change, regressed)]; only rps, p95, CPU/request and errors can regress."""
+    rows = []
+
+    def add(metric, base, cur, higher_is_worse, gated=True):
+        if base is None or cur is None:
+            return
+        change = (cur - base) / base if base else 0.0
+        worse = change if higher_is_worse else -change
+        rows.append((metric, base, cur, change, gated and worse > max_regression))
+
+    add('rps', baseline.get('rps'), report['rps'], False)
+    for p in ('p50', 'p95', 'p99'):
+        add(f'{p} ms', baseline.get('latency_ms', {}).get(p), report['latency_ms'].get(p), True, gated=p == 'p95')
+    add('cpu ms/request', baseline.get('server', {}).get('cpu_ms_per_request'),
+        report['server']['cpu_ms_per_request'], True)
+    add('memory MB peak', baseline.get('server', {}).get('memory_mb_peak'),
+        report['server']['memory_mb_peak'], True, gated=False)
+    base_err, cur_err = baseline.get('error_rate', 0.0), report['error_rate']
+    rows.append(('error rate', base_err, cur_err, cur_err - base_err, cur_err > base_err))
+    return rows
+
+
+def print_report(report):
+    c = report['config']
+    print(f"{c['server']} ({c['workers']} worker(s)), {c['concurrency']} clients, {c['features']} features, "
+          f"mix {','.join(f'{k}={v:g}' for k, v in c['mix'].items())}")
+    lat = report['latency_ms']
+    print(f"{report['requests']} requests in {report['seconds']:.1f}s: {report['rps']:.1f} req/s, "
+          f"errors {report['error_rate']:.2%} {report['errors'] or ''}")
+    print(f'{"kind":<8} {"requests":>9} ' + ' '.join(f'{k + " ms":>9}' for k in ('p50', 'p90', 'p95', 'p99', 'max')))
+    for kind, r in [('all', {'requests': report['requests'], 'latency_ms': lat})] + list(report['by_kind'].items()):
+        l = r['latency_ms']
+        print(f'{kind:<8} {r["requests"]:>9} ' + ' '.join(f'{l.get(k, 0):>9.2f}' for k in ('p50', 'p90', 'p95', 'p99', 'max')))
+    s = report['server']
+    print(f"server: cpu {s['cpu_percent']:.0f}% ({s['cpu_ms_per_request']:.2f} ms/request), "
+          f"memory peak {s['memory_mb_peak']:.1f} MB, mean {s['memory_mb_mean']:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=['app', 'serve'], default='app',
+                        help='app.py (threaded dev server) or serve.py (pre-fork workers)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='serve.py workers')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads (default: 8)')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds (default: 10)')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds first (default: 2)')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests (warm-up included)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'relative weights of request kinds (default: {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=10.0, help='per-request timeout in seconds')
+    parser.add_argument('--baseline', nargs='?', const=str(DEFAULT_BASELINE), metavar='FILE',
+                        help='compare against a saved report and exit 1 on regressions '
+                             f'(default file: {DEFAULT_BASELINE.relative_to(ROOT)})')
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help='allowed relative change before a metric counts as regressed (default: 0.15)')
+    parser.add_argument('--save-baseline', metavar='FILE', help='write this run as a baseline report')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    rows = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        rows = compare(report, baseline, args.max_regression)
+        report['comparison'] = {
+            'baseline': str(args.baseline),
+            'same_config': {k: v for k, v in baseline.get('config', {}).items() if k != 'features'}
+                           == {k: v for k, v in report['config'].items() if k != 'features'},
+            'regressions': [m for m, *_, regressed in rows if regressed],
+        }
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+        if rows is not None:
+            if not report['comparison']['same_config']:
+                print('warning: the baseline was recorded with different options')
+            print(f'\n{"vs " + str(args.baseline):<36} {"baseline":>10} {"current":>10} {"change":>8}')
+            for metric, base, cur, change, regressed in rows:
+                shown = f'{change:+.2%}' if metric == 'error rate' else f'{change:+.1%}'
+                print(f'{metric:<36} {base:>10} {cur:>10} {shown:>8}{"  REGRESSED" if regressed else ""}')
+    if rows is not None and report['comparison']['regressions']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
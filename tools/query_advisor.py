@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""Check the query plan of every statement in queries.sql and propose indexes.
+
+For each statement the advisor runs `EXPLAIN QUERY PLAN` against the database
+and flags:
+- `SCAN <table>` when the statement filters that table (an index could be used)
+  or when the scan is nested inside another loop of a join (unless the table is
+  a small lookup table such as `teams` or `seasons`, see `--small-table`)
+- any `SCAN <table>` of a statement with a WHERE/ON term the advisor cannot
+  attribute to a column (e.g. `lower(name) LIKE :q`), which it cannot index
+  for and so must not pass as ok
+- `USE TEMP B-TREE` (a sort for ORDER BY / GROUP BY / DISTINCT)
+- `AUTOMATIC ... INDEX` (SQLite building a throwaway index on every run)
+
+A full scan of a table the statement reads without any filter (e.g.
+`SELECT ... FROM players_resolved ORDER BY player_id`) is expected and not
+flagged.
+
+For flagged statements it derives candidate indexes from the columns the
+statement (and any view it reads) compares against constants, joins on and
+orders by. Each candidate is tried for real inside a SAVEPOINT, keeping only
+those that actually remove problems from the plan, and the statement is timed
+before and after. `--apply` creates the proposed indexes and runs ANALYZE;
+they should also be added to schema.sql, which `csv_to_sqlite.py --rebuild`
+recreates the database from.
+
+A statement can accept a problem it cannot avoid with a comment inside it:
+
+    -- advisor: allow temp-btree
+    -- advisor: allow scan, automatic-index
+
+Run: python3 tools/query_advisor.py [--db combined_table.db] [--sql queries.sql]
+                                    [--apply] [--check] [--runs 5] [--json]
+`--check` exits with status 1 if any statement still has an unallowed problem.
+"""
+import argparse
+import json
+import re
+import sqlite3
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import named_queries  # noqa: E402
+
+COL = r'(?:(\w+)\.)?(\w+)'
+VALUE = r"(?:\?|[:@$]\w+|-?\d|\(|NULL\b|'')"
+EQ_RE = re.compile(COL + r'\s*(?:==?|\bIS\b|\bIN\b)\s*' + VALUE, re.I)
+RANGE_RE = re.compile(COL + r'\s*(?:<=|>=|<|>|\bBETWEEN\b|\bLIKE\b|\bGLOB\b)\s*' + VALUE, re.I)
+NE_RE = re.compile(COL + r'\s*(?:<>|!=|\bIS\s+NOT\b|\bNOT\s+(?:IN|LIKE|GLOB|BETWEEN)\b)\s*' + VALUE, re.I)
+JOIN_RE = re.compile(r'(\w+)\.(\w+)\s*==?\s*(\w+)\.(\w+)')
+ORDER_RE = re.compile(r'\b(?:ORDER|GROUP)\s+BY\s+(.+?)(?=\bLIMIT\b|\bHAVING\b|\bORDER\b|\bWINDOW\b|\)|;|$)',
+                      re.I | re.S)
+TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|INNER\b|CROSS\b'
+                      r'|GROUP\b|ORDER\b|LIMIT\b|USING\b|NATURAL\b|UNION\b)(\w+))?', re.I)
+CLAUSE_RE = re.compile(r'\b(?:WHERE|ON)\b(.+?)(?=\b(?:SELECT|FROM|WHERE|ON|JOIN|LEFT|INNER|CROSS|GROUP|ORDER'
+                       r'|LIMIT|HAVING|WINDOW|UNION)\b|;|$)', re.I | re.S)
+ALLOW_RE = re.compile(r'--\s*advisor:\s*allow\s+([\w\-, ]+)', re.I)
+SCAN_RE = re.compile(r'^SCAN (\S+)(?: AS (\S+))?')
+KEYWORDS = {'select', 'where', 'and', 'or', 'not', 'on', 'case', 'when', 'then', 'else', 'end', 'as'}
+OPERATORS = {'is', 'in', 'like', 'glob', 'between', 'null', 'true', 'false', 'exists'}
+
+
+def _strip_sql(sql):
+    """Drop comments and empty string literals so the regexes only see SQL."""
+    sql = re.sub(r"'(?:[^']|'')*'", "''", sql)
+    sql = re.sub(r'--[^\n]*', ' ', sql)
+    return re.sub(r'/\*.*?\*/', ' ', sql, flags=re.S)
+
+
+def null_params(sql):
+    """Bind every parameter to NULL so EXPLAIN and timing runs can execute the statement."""
+    clean = _strip_sql(sql)
+    named = re.findall(r'[:@$](\w+)', clean)
+    if named:
+        return {name: None for name in named}
+    return [None] * clean.count('?')
+
+
+def explain(conn, sql):
+    return [(row[0], row[1], row[3]) for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, null_params(sql))]
+
+
+class Schema:
+    def __init__(self, conn):
+        self.conn = conn
+        rows = conn.execute("SELECT name, type, sql FROM sqlite_master WHERE type IN ('table', 'view')").fetchall()
+        self.tables = {name for name, kind, _ in rows if kind == 'table'}
+        self.views = {name: sql for name, kind, sql in rows if kind == 'view'}
+        self._columns = {}
+        self._view_columns = {}
+        self._rows = {}
+        self.small_table = 100
+
+    def columns(self, table):
+        if table not in self._columns:
+            self._columns[table] = [r[1] for r in self.conn.execute(f'PRAGMA table_info("{table}")')]
+        return self._columns[table]
+
+    def view_columns(self, view):
+        """{output column: (qualifier or None, base column)} for a view's plain column outputs."""
+        if view not in self._view_columns:
+            out = {}
+            for item in _select_list(_strip_sql(self.views[view])):
+                m = re.fullmatch(COL + r'(?:\s+(?:AS\s+)?(\w+))?', item.strip(), re.I)
+                if m:
+                    out[m.group(3) or m.group(2)] = (m.group(1), m.group(2))
+            self._view_columns[view] = out
+        return self._view_columns[view]
+
+    def row_count(self, table):
+        if table not in self._rows:
+            stat = None
+            try:
+                stat = self.conn.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = ? AND idx IS NULL',
+                                         (table,)).fetchone()
+            except sqlite3.OperationalError:  # never ANALYZEd
+                pass
+            if stat is None:
+                stat = self.conn.execute(f'SELECT count(*) FROM "{table}"').fetchone()
+            self._rows[table] = int(str(stat[0]).split()[0])
+        return self._rows[table]
+
+    def existing_indexes(self, table):
+        out = []
+        for idx in self.conn.execute(f'PRAGMA index_list("{table}")'):
+            out.append([r[2] for r in self.conn.execute(f'PRAGMA index_info("{idx[1]}")')])
+        return out
+
+    def expand(self, sql):
+        """The statement plus the bodies of the views it reads, recursively (comments stripped)."""
+        texts = [_strip_sql(sql)]
+        seen = set()
+        i = 0
+        while i < len(texts):
+            for name, _ in TABLE_RE.findall(texts[i]):
+                if name in self.views and name not in seen:
+                    seen.add(name)
+                    texts.append(_strip_sql(self.views[name]))
+            i += 1
+        return texts
+
+
+def _select_list(sql):
+    """The top-level items between the first SELECT and its FROM (commas inside parentheses kept)."""
+    m = re.search(r'\bSELECT\b(?:\s+DISTINCT\b)?', sql, re.I)
+    if not m:
+        return []
+    items, depth, start = [], 0, m.end()
+    for tok in re.finditer(r"'(?:[^']|'')*'|[(),]|\bFROM\b", sql[m.end():], re.I):
+        t = tok.group(0)
+        pos = m.end() + tok.start()
+        if t == '(':
+            depth += 1
+        elif t == ')':
+            depth -= 1
+        elif depth == 0 and t == ',':
+            items.append(sql[start:pos])
+            start = pos + 1
+        elif depth == 0 and t.upper() == 'FROM':
+            items.append(sql[start:pos])
+            break
+    return items
+
+
+def references(schema, sql):
+    """Aliases -> tables, and (alias, column, kind) column references for `sql` and its views."""
+    aliases = {}
+    refs = []
+    for text in schema.expand(sql):
+        for name, alias in TABLE_RE.findall(text):
+            if alias.lower() in KEYWORDS:
+                alias = ''
+            aliases.setdefault(name, set()).add(name)
+            if alias:
+                aliases.setdefault(alias, set()).add(name)
+        for m in JOIN_RE.finditer(text):
+            refs.append((m.group(1), m.group(2), 'join'))
+            refs.append((m.group(3), m.group(4), 'join'))
+        for m in EQ_RE.finditer(text):
+            refs.append((m.group(1), m.group(2), 'eq'))
+        for m in RANGE_RE.finditer(text):
+            refs.append((m.group(1), m.group(2), 'range'))
+        for m in ORDER_RE.finditer(text):
+            for term in m.group(1).split(','):
+                cm = re.match(r'\s*' + COL + r'\s*(?:ASC|DESC|COLLATE\s+\w+)?\s*$', term, re.I)
+                if cm:
+                    refs.append((cm.group(1), cm.group(2), 'order'))
+    # `ct.position` on a view: follow its select list to the base column (re.position)
+    seen = set(refs)
+    i = 0
+    while i < len(refs):
+        alias, col, kind = refs[i]
+        for view in sorted(aliases.get(alias, ())) if alias else ():
+            target = schema.view_columns(view).get(col) if view in schema.views else None
+            if target and (target + (kind,)) not in seen:
+                seen.add(target + (kind,))
+                refs.append(target + (kind,))
+        i += 1
+    return aliases, refs
+
+
+def table_refs(schema, table, names, refs):
+    """Column references that belong to `table` (qualified by one of `names`, or bare and in its columns)."""
+    cols = schema.columns(table)
+    out = []
+    for alias, col, kind in refs:
+        if col not in cols:
+            continue
+        if alias is None or alias in names:
+            out.append((col, kind))
+    return out
+
+
+def unattributed_terms(schema, sql, aliases):
+    """WHERE/ON terms of `sql` and its views that compare no known column (e.g. `lower(name) LIKE :q`)."""
+    columns = {c for ts in aliases.values() for t in ts for c in schema.columns(t)}
+    out = []
+    for text in schema.expand(sql):
+        for clause in CLAUSE_RE.findall(text):
+            for term in re.split(r'\b(?:AND|OR)\b', clause, flags=re.I):
+                words = [w for w in re.findall(r'(?<![:@$\w])[A-Za-z_]\w*', term)
+                         if w.lower() not in KEYWORDS | OPERATORS]
+                if not words:  # constants and parameters only, e.g. the `5` of `BETWEEN 1 AND 5`
+                    continue
+                cols = [m.group(2) for r in (EQ_RE, RANGE_RE, NE_RE) for m in r.finditer(term)]
+                cols += [c for m in JOIN_RE.finditer(term) for c in (m.group(2), m.group(4))]
+                if not any(c in columns for c in cols):
+                    out.append(' '.join(term.split()))
+    return out
+
+
+def plan_issues(schema, sql, plan):
+    """[(kind, detail, table or None)] for the problems in an EXPLAIN QUERY PLAN result."""
+    aliases, refs = references(schema, sql)
+    unattributed = unattributed_terms(schema, sql, aliases)
+    issues = []
+    first_loop = {}
+    for node_id, parent, detail in plan:
+        is_loop = detail.startswith(('SCAN ', 'SEARCH '))
+        if is_loop:
+            first_loop.setdefault(parent, node_id)
+        m = SCAN_RE.match(detail)
+        if m and not m.group(1).startswith('CONSTANT'):
+            name = m.group(2) or m.group(1)
+            tables = [t for t in aliases.get(name, {m.group(1)}) if t in schema.tables]
+            names = {name, m.group(1)}
+            filters = [c for t in tables for c, kind in table_refs(schema, t, names, refs)
+                       if kind in ('eq', 'range')]
+            if filters:
+                issues.append(('scan', f'{detail} (filters on {", ".join(sorted(set(filters)))})',
+                               tables[0] if tables else None))
+            elif unattributed:
+                issues.append(('scan', f'{detail} (unattributed filter: {"; ".join(unattributed)})',
+                               tables[0] if tables else None))
+            elif first_loop[parent] != node_id and any(schema.row_count(t) >= schema.small_table for t in tables):
+                issues.append(('scan', f'{detail} (nested inside a join loop)', tables[0] if tables else None))
+        elif 'TEMP B-TREE' in detail:
+            issues.append(('temp-btree', detail, None))
+        elif 'AUTOMATIC' in detail and 'INDEX' in detail:
+            issues.append(('automatic-index', detail, None))
+    return issues
+
+
+def allowed(sql):
+    kinds = set()
+    for m in ALLOW_RE.finditer(sql):
+        kinds.update(k.strip().lower() for k in m.group(1).split(',') if k.strip())
+    return kinds
+
+
+def candidate_indexes(schema, sql, issues):
+    """Plausible (table, columns) indexes for the tables involved in `issues`."""
+    aliases, refs = references(schema, sql)
+    if any(table is None for _, _, table in issues):
+        tables = sorted({t for ts in aliases.values() for t in ts if t in schema.tables})
+    else:
+        tables = sorted({table for _, _, table in issues})
+    out = []
+    for table in tables:
+        names = {a for a, ts in aliases.items() if table in ts}
+        got = table_refs(schema, table, names, refs)
+
+        def cols_of(kind):
+            return list(dict.fromkeys(c for c, k in got if k == kind))
+        eq, rng, order, join = cols_of('eq'), cols_of('range'), cols_of('order'), cols_of('join')
+        options = [eq + rng[:1], eq + [c for c in order if c not in eq], eq, rng[:1], order]
+        options += [[c] for c in join]
+        existing = schema.existing_indexes(table)
+        for cols in options:
+            cols = list(dict.fromkeys(cols))
+            if not cols or cols == ['id'] or any(idx[:len(cols)] == cols for idx in existing):
+                continue
+            if (table, cols) not in out:
+                out.append((table, cols))
+    return out
+
+
+def index_sql(table, cols):
+    name = 'idx_' + '_'.join([table] + cols)
+    return f'CREATE INDEX IF NOT EXISTS {name} ON {table}({", ".join(cols)})'
+
+
+def advise(conn, schema, sql):
+    """Greedily pick candidate indexes that reduce the plan's problems (tried inside a SAVEPOINT)."""
+    ok = allowed(sql)
+    chosen = []
+
+    def score(extra):
+        conn.execute('SAVEPOINT advisor')
+        try:
+            for table, cols in chosen + extra:
+                conn.execute(index_sql(table, cols))
+            return len([i for i in plan_issues(schema, sql, explain(conn, sql)) if i[0] not in ok])
+        finally:
+            conn.execute('ROLLBACK TO advisor')
+            conn.execute('RELEASE advisor')
+
+    best = score([])
+    while best:
+        issues = [i for i in plan_issues(schema, sql, explain(conn, sql)) if i[0] not in ok]
+        trials = [(score([c]), c) for c in candidate_indexes(schema, sql, issues) if c not in chosen]
+        trials = [t for t in trials if t[0] < best]
+        if not trials:
+            break
+        best, pick = min(trials, key=lambda t: (t[0], len(t[1][1])))
+        chosen.append(pick)
+    return chosen
+
+
+def time_query(conn, sql, runs, indexes=()):
+    conn.execute('SAVEPOINT advisor_timing')
+    try:
+        for table, cols in indexes:
+            conn.execute(index_sql(table, cols))
+        params = null_params(sql)
+        samples = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - t0) * 1000)
+        plan = explain(conn, sql)
+        return statistics.median(samples), plan
+    finally:
+        conn.execute('ROLLBACK TO advisor_timing')
+        conn.execute('RELEASE advisor_timing')
+
+
+def review(conn, schema, sql, runs):
+    ok = allowed(sql)
+    plan = explain(conn, sql)
+    issues = plan_issues(schema, sql, plan)
+    report = {
+        'plan': [d for _, _, d in plan],
+        'issues': [{'kind': k, 'detail': d, 'allowed': k in ok} for k, d, _ in issues],
+    }
+    if any(i[0] not in ok for i in issues):
+        proposals = advise(conn, schema, sql)
+        before_ms, _ = time_query(conn, sql, runs)
+        report['before_ms'] = round(before_ms, 3)
+        if proposals:
+            after_ms, after_plan = time_query(conn, sql, runs, proposals)
+            report['after_ms'] = round(after_ms, 3)
+            report['plan_after'] = [d for _, _, d in after_plan]
+        report['proposed'] = [index_sql(t, c) + ';' for t, c in proposals]
+    return report
+
+
+def print_report(results):
+    for r in results:
+        print(f'[{r["index"]}] {r["source"]}: {r["summary"]}')
+        for line in r['plan']:
+            print(f'    plan: {line}')
+        if not r['issues']:
+            print('    ok')
+        for i in r['issues']:
+            print(f'    {"allowed" if i["allowed"] else "!"} {i["kind"]}: {i["detail"]}')
+        for stmt in r.get('proposed', []):
+            print(f'    proposed: {stmt}')
+        for line in r.get('plan_after', []):
+            print(f'    plan after: {line}')
+        if 'before_ms' in r:
+            after = f' -> {r["after_ms"]:.3f} ms' if 'after_ms' in r else ' (no index helps)'
+            print(f'    time: {r["before_ms"]:.3f} ms{after}')
+        if r.get('applied'):
+            print('    applied; add the index to schema.sql as well')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=str(ROOT / 'combined_table.db'))
+    parser.add_argument('--sql', default=str(ROOT / 'queries.sql'))
+    parser.add_argument('--apply', action='store_true', help='create the proposed indexes and run ANALYZE')
+    parser.add_argument('--check', action='store_true', help='exit 1 if any statement has an unallowed problem')
+    parser.add_argument('--runs', type=int, default=5, help='timing runs per statement (median is reported)')
+    parser.add_argument('--small-table', type=int, default=100,
+                        help='nested scans of tables with fewer rows are not flagged (default: 100)')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    schema = Schema(conn)
+    schema.small_table = args.small_table
+    text = Path(args.sql).read_text(encoding='utf-8')
+    results = []
+    for n, query in enumerate(named_queries.parse(text), 1):
+        # the raw text keeps the statement's comments, which may hold '-- advisor: allow ...'
+        sql = query.raw
+        r = review(conn, schema, sql, args.runs)
+        first = ' '.join(_strip_sql(query.sql).split())
+        r.update(index=n, name=query.name, source=f'{Path(args.sql).name}:{query.lineno}',
+                 summary=query.name or first[:90] + ('...' if len(first) > 90 else ''))
+        if args.apply and r.get('proposed'):
+            for stmt in r['proposed']:
+                conn.execute(stmt)
+            conn.execute('ANALYZE')
+            r['applied'] = True
+            plan = explain(conn, sql)
+            r['issues_after_apply'] = [{'kind': k, 'detail': d, 'allowed': k in allowed(sql)}
+                                       for k, d, _ in plan_issues(schema, sql, plan)]
+        results.append(r)
+    conn.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    if args.check:
+        failing = [r['index'] for r in results
+                   if any(not i['allowed'] for i in r.get('issues_after_apply', r['issues']))]
+        if failing:
+            print(f'query plan check failed for statement(s): {", ".join(map(str, failing))}', file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())